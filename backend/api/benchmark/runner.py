@@ -0,0 +1,166 @@
+# backend/api/benchmark/runner.py
+# Прогон запросов к API через django.test.Client: настоящие маршруты
+# api/urls.py и весь стек middleware, без сетевого сервера. Запросы
+# выполняются в нескольких потоках, у каждого своё соединение с БД.
+
+import random
+import statistics
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from api.middleware import QueryRecorder
+from api.pagination import RecipePagination
+
+# build(dataset, rng) -> (путь, тело POST или None)
+Endpoint = namedtuple('Endpoint', 'name method auth build')
+
+
+def last_page(dataset):
+    return max(2, len(dataset.recipes) // RecipePagination.page_size)
+
+
+def recipe_detail(dataset, rng):
+    return reverse('recipes-detail', args=[rng.choice(dataset.recipes)]), None
+
+
+ENDPOINTS = (
+    Endpoint('recipes-list', 'get', False, lambda dataset, rng: (
+        reverse('recipes-list'), None)),
+    Endpoint('recipes-list-page', 'get', False, lambda dataset, rng: (
+        f'{reverse("recipes-list")}?page={rng.randint(2, last_page(dataset))}',
+        None)),
+    Endpoint('recipes-list-popular', 'get', False, lambda dataset, rng: (
+        f'{reverse("recipes-list")}?ordering=popular', None)),
+    Endpoint('recipes-list-tags', 'get', False, lambda dataset, rng: (
+        f'{reverse("recipes-list")}?tags={rng.choice(dataset.tags)}', None)),
+    Endpoint('recipes-list-search', 'get', False, lambda dataset, rng: (
+        f'{reverse("recipes-list")}?search={rng.choice(dataset.words)}',
+        None)),
+    Endpoint('recipes-list-favorited', 'get', True, lambda dataset, rng: (
+        f'{reverse("recipes-list")}?is_favorited=1', None)),
+    Endpoint('recipes-detail', 'get', False, recipe_detail),
+    Endpoint('recipes-detail-auth', 'get', True, recipe_detail),
+    Endpoint('recipes-feed', 'get', True, lambda dataset, rng: (
+        reverse('recipes-feed'), None)),
+    Endpoint('recipes-match', 'post', False, lambda dataset, rng: (
+        reverse('recipes-match'),
+        {'ingredients': rng.sample(dataset.ingredients, 5)})),
+    Endpoint('recipes-shopping-cart-summary', 'get', True,
+             lambda dataset, rng: (
+                 reverse('recipes-shopping-cart-summary'), None)),
+    Endpoint('recipes-download-shopping-cart', 'get', True,
+             lambda dataset, rng: (
+                 reverse('recipes-download-shopping-cart'), None)),
+    Endpoint('tags-list', 'get', False, lambda dataset, rng: (
+        reverse('tags-list'), None)),
+    Endpoint('ingredients-list-name', 'get', False, lambda dataset, rng: (
+        f'{reverse("ingredients-list")}?name=bench', None)),
+    Endpoint('users-list', 'get', True, lambda dataset, rng: (
+        reverse('users-list'), None)),
+    Endpoint('users-me', 'get', True, lambda dataset, rng: (
+        reverse('users-me'), None)),
+    Endpoint('users-subscriptions', 'get', True, lambda dataset, rng: (
+        f'{reverse("users-subscriptions")}?recipes_limit=3', None)),
+)
+
+
+def percentile(ordered, share):
+    # ближайший ранг: значение, не превышенное долей share замеров
+    return ordered[max(0, round(len(ordered) * share) - 1)]
+
+
+class Runner:
+    def __init__(self, dataset, seed, concurrency):
+        self.dataset = dataset
+        self.seed = seed
+        self.concurrency = concurrency
+        self._local = threading.local()
+
+    def client(self, user_id):
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        if user_id not in clients:
+            headers = {'SERVER_NAME': settings.ALLOWED_HOSTS[0]}
+            if user_id is not None:
+                headers['HTTP_AUTHORIZATION'] = (
+                    f'Token {self.dataset.tokens[user_id]}')
+            clients[user_id] = Client(**headers)
+        return clients[user_id]
+
+    def request(self, endpoint, number):
+        rng = random.Random(f'{self.seed}:{endpoint.name}:{number}')
+        user_id = rng.choice(self.dataset.users) if endpoint.auth else None
+        path, data = endpoint.build(self.dataset, rng)
+        client = self.client(user_id)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            started = time.perf_counter()
+            if data is None:
+                response = getattr(client, endpoint.method)(path)
+            else:
+                response = getattr(client, endpoint.method)(
+                    path, data, content_type='application/json')
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elapsed = (time.perf_counter() - started) * 1000
+        return endpoint.name, elapsed, recorder.count, response.status_code
+
+    def run_chunk(self, jobs):
+        try:
+            return [
+                self.request(endpoint, number) for endpoint, number in jobs]
+        finally:
+            connection.close()
+
+    def run(self, endpoints, requests, warmup):
+        """Замеры по каждому эндпоинту; первые warmup запросов
+        (заполнение кешей и индексов в памяти) в отчёт не входят."""
+        for endpoint in endpoints:
+            for number in range(-warmup, 0):
+                self.request(endpoint, number)
+        jobs = [
+            (endpoint, number)
+            for endpoint in endpoints
+            for number in range(requests)
+        ]
+        random.Random(self.seed).shuffle(jobs)
+        if self.concurrency == 1:
+            measurements = [
+                self.request(endpoint, number) for endpoint, number in jobs]
+        else:
+            chunks = [jobs[index::self.concurrency]
+                      for index in range(self.concurrency)]
+            with ThreadPoolExecutor(self.concurrency) as executor:
+                measurements = [
+                    measurement
+                    for chunk in executor.map(self.run_chunk, chunks)
+                    for measurement in chunk
+                ]
+        return self.report(endpoints, measurements)
+
+    def report(self, endpoints, measurements):
+        results = {}
+        for endpoint in endpoints:
+            rows = [row for row in measurements if row[0] == endpoint.name]
+            timings = sorted(elapsed for _, elapsed, _, _ in rows)
+            queries = [count for _, _, count, _ in rows]
+            results[endpoint.name] = {
+                'requests': len(rows),
+                'errors': sum(1 for *_, status in rows if status >= 400),
+                'p50_ms': round(percentile(timings, 0.50), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                'p99_ms': round(percentile(timings, 0.99), 2),
+                'mean_ms': round(statistics.fmean(timings), 2),
+                'queries_min': min(queries),
+                'queries_max': max(queries),
+            }
+        return results
@@ -0,0 +1,176 @@
+# backend/api/benchmark/seed.py
+# Синтетический набор данных для бенчмарка API. Всё создаётся через
+# bulk_create, поэтому счётчики, итоги корзин и версии кеша
+# обновляются отдельно, как после base_load_command.
+
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS
+from django.test.utils import (override_settings, setup_databases,
+                               teardown_databases)
+from rest_framework.authtoken.models import Token
+
+from food import counters, shopping_cart
+from food.cache import bump_version
+from food.models import (Favorite, Follow, Ingredient, Recipe,
+                         RecipeIngredient, ShoppingCartItem, Tag, User)
+from food.popularity import refresh_popularity
+
+PREFIX = 'bench_'
+BATCH_SIZE = 5000
+TAGS_COUNT = 6
+INGREDIENTS_COUNT = 300
+WORDS = (
+    'борщ', 'суп', 'салат', 'пирог', 'блины', 'каша', 'котлеты', 'плов',
+    'курица', 'говядина', 'рыба', 'грибы', 'сыр', 'рис', 'гречка', 'томаты',
+)
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+Dataset = namedtuple(
+    'Dataset', 'users tokens recipes tags ingredients words')
+
+
+def sample(rng, population, count):
+    return rng.sample(population, min(count, len(population)))
+
+
+def seed(rng, users_count, recipes_per_user, follows_per_user,
+         favorites_per_user, cart_per_user, ingredients_per_recipe):
+    Tag.objects.bulk_create(
+        Tag(name=f'{PREFIX}{number}', slug=f'{PREFIX}{number}')
+        for number in range(TAGS_COUNT)
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'{PREFIX}продукт {number}', measurement_unit='г')
+        for number in range(INGREDIENTS_COUNT)
+    )
+    password = make_password(None)
+    User.objects.bulk_create(
+        (
+            User(
+                username=f'{PREFIX}{number}',
+                email=f'{PREFIX}{number}@example.com',
+                first_name='Бенчмарк',
+                last_name=str(number),
+                password=password,
+            )
+            for number in range(users_count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    # перечитываем: не все backend возвращают id из bulk_create
+    users = list(User.objects.filter(
+        username__startswith=PREFIX).values_list('id', flat=True))
+    tags = list(Tag.objects.filter(
+        slug__startswith=PREFIX).values_list('id', 'slug'))
+    ingredients = list(Ingredient.objects.filter(
+        name__startswith=PREFIX).values_list('id', flat=True))
+    tokens = {user_id: Token.generate_key() for user_id in users}
+    Token.objects.bulk_create(
+        (Token(user_id=user_id, key=key) for user_id, key in tokens.items()),
+        batch_size=BATCH_SIZE,
+    )
+
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author_id=user_id,
+                name=' '.join(sample(rng, WORDS, 2)) + f' {number}',
+                text=' '.join(sample(rng, WORDS, 8)),
+                image='recipes/bench.png',
+                cooking_time=rng.randint(5, 180),
+            )
+            for user_id in users
+            for number in range(recipes_per_user)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    recipes = list(Recipe.objects.filter(
+        author__username__startswith=PREFIX).values_list('id', flat=True))
+    Recipe.tags.through.objects.bulk_create(
+        (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipes
+            for tag_id, _ in sample(rng, tags, rng.randint(1, 2))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    RecipeIngredient.objects.bulk_create(
+        (
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500),
+            )
+            for recipe_id in recipes
+            for ingredient_id in sample(
+                rng, ingredients, ingredients_per_recipe)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    Follow.objects.bulk_create(
+        (
+            Follow(follower_id=user_id, author_id=author_id)
+            for user_id in users
+            for author_id in sample(rng, users, follows_per_user + 1)
+            if author_id != user_id
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    for model, count in (
+        (Favorite, favorites_per_user),
+        (ShoppingCartItem, cart_per_user),
+    ):
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in users
+                for recipe_id in sample(rng, recipes, count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    refresh_derived_data()
+    return Dataset(
+        users=users,
+        tokens=tokens,
+        recipes=recipes,
+        tags=[slug for _, slug in tags],
+        ingredients=ingredients,
+        words=WORDS,
+    )
+
+
+def refresh_derived_data():
+    counters.recount()
+    shopping_cart.rebuild()
+    refresh_popularity()
+    for model in (Recipe, RecipeIngredient, Tag, Ingredient, User):
+        bump_version(model)
+
+
+@contextmanager
+def isolated_database(verbosity=1):
+    """Отдельные база и кеш на время бенчмарка.
+
+    База создаётся и удаляется так же, как в manage.py test (test_<NAME>,
+    для SQLite — в памяти), кеш — в памяти процесса. Данные
+    замера не попадают в рабочую базу и кеш, а пересчёт счётчиков,
+    итогов корзин и популярности идёт только по синтетическим данным.
+    """
+    with override_settings(CACHES=BENCHMARK_CACHES):
+        old_config = setup_databases(
+            verbosity, interactive=False, aliases={DEFAULT_DB_ALIAS},
+            serialized_aliases=set())
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity)
@@ -0,0 +1,34 @@
+# backend/api/conditional.py
+# Условные GET-запросы: ETag строится из дешёвых меток версий
+# (food.cache, Recipe.updated), и при совпадении If-None-Match ответ 304
+# отдаётся без выборки и сериализации данных. Last-Modified не отдаётся:
+# ответ рецепта зависит и от тегов, продуктов и профиля автора, у которых
+# нет общей метки времени, а If-Modified-Since без ETag дал бы 304
+# с устаревшими данными.
+
+import hashlib
+
+from django.utils.cache import (get_conditional_response, patch_vary_headers,
+                                quote_etag)
+from rest_framework import status
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:40])
+
+
+def conditional_response(request, etag, build, per_user=False):
+    """Ответ 304, если у клиента актуальная версия, иначе build().
+
+    per_user — ответ зависит от пользователя (флаги избранного,
+    корзины, подписки), такой ETag уже содержит id пользователя.
+    """
+    response = get_conditional_response(request._request, etag=etag)
+    if response is None:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    response['ETag'] = etag
+    if per_user:
+        patch_vary_headers(response, ('Authorization',))
+    return response
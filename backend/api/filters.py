@@ -3,6 +3,7 @@
 from django_filters import rest_framework as filters
 
 from food.models import Recipe, Tag
+from food.search import search_recipes
 
 
 class RecipeFilter(filters.FilterSet):
@@ -16,6 +17,21 @@ class RecipeFilter(filters.FilterSet):
         to_field_name='slug',
         queryset=Tag.objects.all(),
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(
+            ('new', 'Новые'),
+            ('popular', 'Популярные'),
+            ('quick', 'Быстрые'),
+        ),
+        method='filter_ordering',
+    )
+
+    ORDERINGS = {
+        'new': ('-id',),
+        'popular': ('-popularity', '-id'),
+        'quick': ('cooking_time', '-id'),
+    }
 
     class Meta:
         model = Recipe
@@ -24,12 +40,17 @@ class RecipeFilter(filters.FilterSet):
     def filter_is_favorited(self, recipes, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-
-            return recipes.filter(favorites__user=user)
+            return recipes.filter(is_favorited=True)
         return recipes
 
     def filter_is_in_shopping_cart(self, recipes, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return recipes.filter(shoppingcartitems__user=user)
+            return recipes.filter(is_in_shopping_cart=True)
         return recipes
+
+    def filter_search(self, recipes, name, value):
+        return search_recipes(recipes, value)
+
+    def filter_ordering(self, recipes, name, value):
+        return recipes.order_by(*self.ORDERINGS[value])
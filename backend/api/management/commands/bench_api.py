@@ -0,0 +1,98 @@
+# бенчмарк API на синтетических данных, отчёт в JSON для сравнения
+# между коммитами:
+# python manage.py bench_api --users 1000 --concurrency 4 -o before.json
+# данные создаются в отдельной тестовой базе (как у manage.py test),
+# которая удаляется после замера; рабочая база и кеш не затрагиваются,
+# нужно право на создание базы
+
+import json
+import platform
+import random
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.benchmark import seed as dataset
+from api.benchmark.runner import ENDPOINTS, Runner
+
+
+class Command(BaseCommand):
+    help = 'Замер p50/p95/p99 и числа запросов к БД по эндпоинтам API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes-per-user', type=int, default=5)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=5)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='замеров на эндпоинт')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--endpoint', action='append',
+                            help='только эти эндпоинты (можно повторять)')
+        parser.add_argument('-o', '--output',
+                            help='файл отчёта, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        endpoints = [
+            endpoint for endpoint in ENDPOINTS
+            if not options['endpoint'] or endpoint.name in options['endpoint']
+        ]
+        if not endpoints:
+            raise CommandError(
+                'Нет таких эндпоинтов, есть: '
+                + ', '.join(endpoint.name for endpoint in ENDPOINTS))
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency и --requests от 1')
+        sizes = {
+            key: options[key] for key in (
+                'users', 'recipes_per_user', 'follows_per_user',
+                'favorites_per_user', 'cart_per_user',
+                'ingredients_per_recipe',
+            )
+        }
+        with dataset.isolated_database(options['verbosity']):
+            data = dataset.seed(
+                random.Random(options['seed']),
+                users_count=options['users'],
+                **{key: value for key, value in sizes.items()
+                   if key != 'users'},
+            )
+            results = Runner(
+                data, options['seed'], options['concurrency']
+            ).run(endpoints, options['requests'], options['warmup'])
+
+        report = json.dumps({
+            'meta': {
+                'commit': self.commit(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'dataset': sizes,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'seed': options['seed'],
+            },
+            'endpoints': results,
+        }, ensure_ascii=False, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+            self.stderr.write(f'Отчёт записан в {options["output"]}')
+        else:
+            self.stdout.write(report)
+
+    @staticmethod
+    def commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
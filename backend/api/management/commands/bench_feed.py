@@ -0,0 +1,98 @@
+# замер ленты подписок /api/recipes/feed/ на синтетических данных
+# бенчмарка (api.benchmark.seed):
+# python manage.py bench_feed --authors 1000
+# данные создаются в отдельной тестовой базе, она удаляется после замера
+
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.benchmark import seed as dataset
+from api.benchmark.runner import percentile
+from api.views import RecipeViewSet
+from food import feed
+from food.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Замер ленты подписок для пользователя с множеством подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--recipes-per-author', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        # кеш бенчмарка в памяти одного процесса, голову ленты можно
+        # кешировать и без REDIS_URL
+        with dataset.isolated_database(options['verbosity']), \
+                override_settings(FEED_HEAD_CACHE_TIMEOUT=600):
+            reader = self.seed(
+                options['seed'], options['authors'],
+                options['recipes_per_author'])
+            self.measure(reader, options['repeat'])
+
+    def seed(self, seed, authors_count, recipes_per_author):
+        data = dataset.seed(
+            random.Random(seed),
+            users_count=authors_count + 1,
+            recipes_per_user=recipes_per_author,
+            follows_per_user=0,
+            favorites_per_user=0,
+            cart_per_user=0,
+            ingredients_per_recipe=0,
+        )
+        reader_id, *authors = data.users
+        Follow.objects.bulk_create(
+            (Follow(follower_id=reader_id, author_id=author_id)
+             for author_id in authors),
+            batch_size=dataset.BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        self.stdout.write(
+            f'Подписок: {authors_count}, '
+            f'рецептов: {authors_count * recipes_per_author}'
+        )
+        return User.objects.get(pk=reader_id)
+
+    def request(self, reader, query=''):
+        request = APIRequestFactory().get(
+            f'/api/recipes/feed/{query}',
+            SERVER_NAME=settings.ALLOWED_HOSTS[0],
+        )
+        force_authenticate(request, reader)
+        view = RecipeViewSet.as_view({'get': 'feed'})
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            elapsed = (time.perf_counter() - started) * 1000
+        return response, elapsed, len(queries)
+
+    def report(self, title, timings, queries):
+        timings.sort()
+        self.stdout.write(
+            f'{title}: p50 {percentile(timings, 0.50):.1f} мс, '
+            f'p95 {percentile(timings, 0.95):.1f} мс, запросов {queries}'
+        )
+
+    def measure(self, reader, repeat):
+        cold, warm, deep = [], [], []
+        for _ in range(repeat):
+            feed.invalidate(reader.pk)
+            _, elapsed, cold_queries = self.request(reader)
+            cold.append(elapsed)
+            response, elapsed, warm_queries = self.request(reader)
+            warm.append(elapsed)
+            next_query = '?' + response.data['next'].split('?', 1)[1]
+            _, elapsed, deep_queries = self.request(reader, next_query)
+            deep.append(elapsed)
+        self.report('первая страница, голова не в кеше', cold, cold_queries)
+        self.report('первая страница, голова в кеше', warm, warm_queries)
+        self.report('следующая страница по курсору', deep, deep_queries)
@@ -0,0 +1,70 @@
+# замер скорости поиска рецептов на синтетических данных бенчмарка
+# (api.benchmark.seed):
+# python manage.py bench_recipe_search --recipes 100000
+# данные создаются в отдельной тестовой базе, она удаляется после замера
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.benchmark import seed as dataset
+from api.benchmark.runner import percentile
+from food.models import Recipe
+from food.search import search_recipes
+
+# слова из dataset.WORDS, префикс и слово, которого нет
+QUERIES = ('борщ', 'курица рис', 'томаты', 'пир', 'нет такого слова')
+
+
+class Command(BaseCommand):
+    help = 'Замер поиска рецептов (?search=) на синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--recipes-per-user', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        with dataset.isolated_database(options['verbosity']):
+            self.seed(
+                options['seed'], options['recipes'],
+                options['recipes_per_user'])
+            self.measure(options['repeat'])
+
+    def seed(self, seed, count, recipes_per_user):
+        started = time.perf_counter()
+        data = dataset.seed(
+            random.Random(seed),
+            users_count=max(1, count // recipes_per_user),
+            recipes_per_user=min(count, recipes_per_user),
+            follows_per_user=0,
+            favorites_per_user=0,
+            cart_per_user=0,
+            ingredients_per_recipe=0,
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE food_recipe')
+        self.stdout.write(
+            f'Создано {len(data.recipes)} рецептов за '
+            f'{time.perf_counter() - started:.1f} с'
+        )
+
+    def measure(self, repeat):
+        for query in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                recipes = search_recipes(Recipe.objects.all(), query)
+                found = recipes.count()
+                list(recipes[:6])
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f'{query!r}: найдено {found}, '
+                f'p50 {percentile(timings, 0.50):.1f} мс, '
+                f'p95 {percentile(timings, 0.95):.1f} мс'
+            )
@@ -0,0 +1,114 @@
+# backend/api/metrics.py
+# Гистограммы и счётчики запросов в памяти процесса для /api/_metrics
+# (формат Prometheus). У каждого воркера gunicorn свои значения.
+
+import re
+import threading
+from collections import Counter, defaultdict
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+HISTOGRAMS = {
+    # имя: (описание, границы корзин)
+    'foodgram_request_duration_seconds': (
+        'Время обработки запроса', DURATION_BUCKETS),
+    'foodgram_request_db_seconds': (
+        'Время запросов к БД за запрос', DURATION_BUCKETS),
+    'foodgram_request_queries': (
+        'Число запросов к БД за запрос', QUERY_BUCKETS),
+    'foodgram_response_bytes': (
+        'Размер ответа (кроме потоковых)', SIZE_BUCKETS),
+}
+COUNTERS = {
+    'foodgram_requests_total': 'Число запросов',
+    'foodgram_duplicate_queries_total': (
+        'Повторы одинаковых запросов к БД (признак N+1)'),
+}
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+def fingerprint(sql):
+    # параметры уже вынесены в %s, сворачиваем только списки IN (...)
+    return IN_LIST.sub('(%s...)', sql)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(dict)  # имя -> {метки: Histogram}
+        self._counters = defaultdict(Counter)  # имя -> {метки: значение}
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            histograms = self._histograms[name]
+            if labels not in histograms:
+                histograms[labels] = Histogram(HISTOGRAMS[name][1])
+            histograms[labels].observe(value)
+
+    def increment(self, name, labels, value=1):
+        with self._lock:
+            self._counters[name][labels] += value
+
+    def render(self):
+        """Текстовый формат Prometheus 0.0.4."""
+        lines = []
+        with self._lock:
+            for name, (description, _) in HISTOGRAMS.items():
+                lines += [f'# HELP {name} {description}',
+                          f'# TYPE {name} histogram']
+                for labels, histogram in sorted(
+                        self._histograms[name].items()):
+                    for bound, count in zip(
+                            histogram.buckets, histogram.counts):
+                        lines.append(
+                            f'{name}_bucket'
+                            f'{format_labels(labels, le=bound)} {count}')
+                    lines += [
+                        f'{name}_bucket{format_labels(labels, le="+Inf")} '
+                        f'{histogram.total}',
+                        f'{name}_sum{format_labels(labels)} '
+                        f'{histogram.sum}',
+                        f'{name}_count{format_labels(labels)} '
+                        f'{histogram.total}',
+                    ]
+            for name, description in COUNTERS.items():
+                lines += [f'# HELP {name} {description}',
+                          f'# TYPE {name} counter']
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            key,
+            str(value).replace('\\', r'\\').replace('"', r'\"'),
+        )
+        for key, value in pairs
+    ) + '}'
+
+
+registry = Registry()
@@ -0,0 +1,111 @@
+# backend/api/middleware.py
+
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from api.metrics import fingerprint, registry
+
+logger = logging.getLogger('foodgram.performance')
+
+
+class QueryRecorder:
+    """Обёртка выполнения запросов к БД (connection.execute_wrapper):
+    число, суммарное время и отпечатки запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return {
+            sql: count for sql, count in self.fingerprints.items()
+            if count > 1
+        }
+
+
+class PerformanceMiddleware:
+    """Время, запросы к БД и размер ответа для каждого запроса.
+
+    Добавляет заголовок Server-Timing, пишет в лог медленные запросы
+    и запросы с повторами (N+1), копит гистограммы для /api/_metrics.
+    Для потоковых ответов учитывается время до первого байта.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PERFORMANCE_METRICS:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        self.record(request, response, recorder, duration)
+        return response
+
+    def record(self, request, response, recorder, duration):
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        size = None if response.streaming else len(response.content)
+        duplicates = recorder.duplicates()
+
+        response['Server-Timing'] = (
+            f'app;dur={(duration - recorder.duration) * 1000:.1f}, '
+            f'db;dur={recorder.duration * 1000:.1f};'
+            f'desc="{recorder.count} queries"'
+        )
+
+        labels = (('view', view),)
+        registry.increment(
+            'foodgram_requests_total',
+            (*labels, ('status', response.status_code)))
+        registry.observe(
+            'foodgram_request_duration_seconds', labels, duration)
+        registry.observe(
+            'foodgram_request_db_seconds', labels, recorder.duration)
+        registry.observe('foodgram_request_queries', labels, recorder.count)
+        if size is not None:
+            registry.observe('foodgram_response_bytes', labels, size)
+        repeated = sum(duplicates.values()) - len(duplicates)
+        if repeated:
+            registry.increment(
+                'foodgram_duplicate_queries_total', labels, repeated)
+
+        if (
+            duration * 1000 >= settings.SLOW_REQUEST_MS
+            or recorder.count >= settings.SLOW_REQUEST_QUERIES
+            or max(duplicates.values(), default=0)
+            >= settings.SLOW_REQUEST_DUPLICATES
+        ):
+            logger.warning('slow request %s', json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'db_ms': round(recorder.duration * 1000, 1),
+                'queries': recorder.count,
+                'response_bytes': size,
+                # самые частые повторы
+                'duplicates': dict(Counter(duplicates).most_common(5)),
+            }, ensure_ascii=False))
@@ -1,7 +1,142 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (CursorPagination, PageNumberPagination,
+                                       _reverse_ordering)
+
+# поля, уникальные сами по себе: после них позиция курсора однозначна
+UNIQUE_ORDERING = {'id', '-id', 'pk', '-pk'}
+
+
+def keyset_filter(ordering, values):
+    """Условие «строго после позиции values» при сортировке ordering:
+    (a, id) после (x, y) — это a > x или a = x и id > y."""
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
 
 
 class RecipePagination(PageNumberPagination):
     page_size = 6
     max_page_size = 100
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Пагинация по ключу без OFFSET и COUNT(*).
+
+    Включается параметром ?cursor= (пустым для первой страницы),
+    дальше клиент переходит по ссылкам next/previous.
+    Позиция курсора — значения всех полей сортировки вместе с id,
+    а не только первого поля, как в CursorPagination: при тысячах
+    рецептов с одинаковым временем приготовления страницы не
+    повторяются и не упираются в offset_cutoff.
+    """
+    page_size = RecipePagination.page_size
+    max_page_size = RecipePagination.max_page_size
+    page_size_query_param = RecipePagination.page_size_query_param
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        # CursorPagination сортирует по self.ordering и сбросил бы
+        # сортировку, выбранную фильтром (?ordering=popular|quick)
+        ordering = queryset.query.order_by
+        if not ordering:
+            ordering = super().get_ordering(request, queryset, view)
+        if not all(isinstance(field, str) for field in ordering):
+            # сортировка по выражению (релевантность ?search=) не может
+            # быть позицией курсора
+            raise ValidationError({
+                self.cursor_query_param:
+                    'Курсорная пагинация недоступна для этой сортировки, '
+                    'используйте page и limit.'
+            })
+        ordering = tuple(ordering)
+        if not UNIQUE_ORDERING & set(ordering):
+            ordering += ('-id',)
+        return ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([
+            getattr(instance, field.lstrip('-')) for field in ordering])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # как CursorPagination.paginate_queryset, но отбор после позиции
+        # идёт по всем полям сортировки (keyset_filter)
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+        ordering = (
+            _reverse_ordering(self.ordering) if reverse else self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = self.filter_after(queryset, ordering, current_position)
+
+        # лишняя запись показывает, есть ли следующая страница
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def filter_after(self, queryset, ordering, position):
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError(position)
+            return queryset.filter(keyset_filter(ordering, values))
+        except (ValueError, TypeError, DjangoValidationError):
+            # курсор от другой сортировки или подделан
+            raise NotFound(self.invalid_cursor_message)
+
+    @classmethod
+    def is_requested(cls, request):
+        return cls.cursor_query_param in request.query_params
+
+
+class SubscriptionCursorPagination(RecipeCursorPagination):
+    ordering = 'username'
+
+
+def get_paginator(request, cursor_class=RecipeCursorPagination):
+    if cursor_class.is_requested(request):
+        return cursor_class()
+    return RecipePagination()
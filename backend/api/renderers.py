@@ -0,0 +1,46 @@
+# backend/api/renderers.py
+# Рендереры нужны DRF для разбора ?format= у выгрузки списка покупок:
+# сам файл отдаётся потоком (StreamingHttpResponse) в обход рендера,
+# через render() проходят только ответы с ошибками, они отдаются в JSON.
+
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Метрики /api/_metrics в текстовом формате Prometheus."""
+
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode('utf-8')
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
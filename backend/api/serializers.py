@@ -4,24 +4,53 @@ from django.contrib.auth import get_user_model
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from rest_framework import serializers
 
+from api.pagination import RecipePagination
+from food import matching, shopping_cart, thumbnails
 from food.constants import INGREDIENT_MIN_AMOUNT, RECIPE_MIN_COOKING_TIME
 from food.models import (Favorite, Follow, Ingredient, Recipe,
-                         RecipeIngredient, ShoppingCartItem, Tag)
+                         RecipeIngredient, ShoppingCartItem, ShoppingCartTotal,
+                         Tag)
 from library.base64ImageField import Base64ImageField
 
 User = get_user_model()
 
 
+class ThumbnailsField(serializers.ReadOnlyField):
+    """Адреса миниатюр по хешу изображения, None — пока не собраны."""
+
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        super().__init__(**kwargs)
+
+    def to_representation(self, digest):
+        if not digest:
+            return None
+        request = self.context.get('request')
+        return {
+            variant: {
+                extension: (
+                    request.build_absolute_uri(url) if request else url)
+                for extension, url in urls.items()
+            }
+            for variant, urls in thumbnails.variant_urls(
+                digest, self.kind).items()
+        }
+
+
 class FoodgramUserSerializer(DjoserUserSerializer):
     avatar = Base64ImageField(required=False, allow_null=True)
+    avatar_thumbnails = ThumbnailsField('avatar', source='avatar_hash')
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = (*DjoserUserSerializer.Meta.fields, 'avatar', 'is_subscribed')
+        fields = (*DjoserUserSerializer.Meta.fields,
+                  'avatar', 'avatar_thumbnails', 'is_subscribed')
         read_only_fields = fields
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         request = self.context.get('request')
         return (
             request
@@ -55,6 +84,18 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class ShoppingCartTotalSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = ShoppingCartTotal
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+        read_only_fields = fields
+
+
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
     id = serializers.PrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
@@ -78,6 +119,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     author = FoodgramUserSerializer()
     tags = TagSerializer(many=True)
 
+    image_thumbnails = ThumbnailsField('recipe', source='image_hash')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -85,10 +127,19 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
                   'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time')
+                  'image', 'image_thumbnails', 'text', 'cooking_time')
         read_only_fields = fields
 
-    def check_user_status(self, recipe, model_class):
+    def to_representation(self, recipe):
+        if hasattr(recipe, 'author_is_subscribed'):
+            recipe.author.is_subscribed = recipe.author_is_subscribed
+        return super().to_representation(recipe)
+
+    def check_user_status(self, recipe, model_class, annotation):
+        # RecipeViewSet.get_queryset отдаёт флаги аннотациями,
+        # запрос в базу — только для рецептов без них
+        if hasattr(recipe, annotation):
+            return getattr(recipe, annotation)
         request = self.context.get('request')
         return (
             request
@@ -98,10 +149,11 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, recipe):
-        return self.check_user_status(recipe, Favorite)
+        return self.check_user_status(recipe, Favorite, 'is_favorited')
 
     def get_is_in_shopping_cart(self, recipe):
-        return self.check_user_status(recipe, ShoppingCartItem)
+        return self.check_user_status(
+            recipe, ShoppingCartItem, 'is_in_shopping_cart')
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
@@ -147,6 +199,11 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
             for item in ingredients
         )
+        # bulk_create не посылает post_save, итоги корзин обновляем сами
+        shopping_cart.change_recipe_ingredients(recipe.id, {
+            item['ingredient'].id: item['amount'] for item in ingredients
+        })
+        matching.recipe_changed(recipe.id)
 
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
@@ -160,13 +217,54 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    def update_ingredients(self, ingredients, recipe):
+        """Изменить состав рецепта по разнице с сохранённым: меняются,
+        добавляются и удаляются только отличающиеся строки."""
+        saved = {
+            item.ingredient_id: item
+            for item in recipe.ingredients_in_recipe.all()
+        }
+        amounts = {
+            item['ingredient'].id: item['amount'] for item in ingredients
+        }
+        changed = []
+        added = []
+        deltas = {}
+        for ingredient_id, amount in amounts.items():
+            item = saved.get(ingredient_id)
+            if item is None:
+                added.append(RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id,
+                    amount=amount))
+                deltas[ingredient_id] = amount
+            elif item.amount != amount:
+                deltas[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        removed = [
+            item.pk for ingredient_id, item in saved.items()
+            if ingredient_id not in amounts
+        ]
+        if removed:
+            # post_delete сам вычтет удалённые строки из итогов корзин
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if not deltas:
+            return
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        RecipeIngredient.objects.bulk_create(added)
+        # bulk_update и bulk_create не посылают post_save
+        shopping_cart.change_recipe_ingredients(recipe.id, deltas)
+        matching.recipe_changed(recipe.id)
+
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredients', [])
-        tags_data = validated_data.pop('tags', [])
+        ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags')
 
-        instance.tags.set(tags_data)
-        instance.ingredients_in_recipe.all().delete()
-        self.create_ingredients(ingredients_data, instance)
+        # теги и продукты берутся из prefetch_related в get_queryset
+        if ({tag.id for tag in tags}
+                != {tag.id for tag in instance.tags.all()}):
+            instance.tags.set(tags)
+        self.update_ingredients(ingredients, instance)
         return super().update(instance, validated_data)
 
     def validate_ingredients(self, ingredients):
@@ -221,16 +319,48 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image_thumbnails = ThumbnailsField('recipe', source='image_hash')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnails', 'cooking_time')
+        read_only_fields = fields
+
+
+class SimilarRecipeSerializer(ShortRecipeSerializer):
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(ShortRecipeSerializer.Meta):
+        fields = (*ShortRecipeSerializer.Meta.fields, 'similarity')
         read_only_fields = fields
 
 
+class RecipeMatchRequestSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        label='Продукты',
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=RecipePagination.max_page_size,
+        default=RecipePagination.page_size,
+    )
+
+
+class RecipeMatchSerializer(serializers.Serializer):
+    recipe = ShortRecipeSerializer()
+    coverage = serializers.FloatField()
+    missing = RecipeIngredientReadSerializer(many=True)
+
+
 class UserSerializer(DjoserUserSerializer):
+    avatar_thumbnails = ThumbnailsField('avatar', source='avatar_hash')
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, followed_user):
+        if hasattr(followed_user, 'is_subscribed'):
+            return followed_user.is_subscribed
         user = self.context['request'].user
         return user.is_authenticated and Follow.objects.filter(
             follower=user, author=followed_user
@@ -239,16 +369,12 @@ class UserSerializer(DjoserUserSerializer):
     class Meta:
         model = User
         fields = (*DjoserUserSerializer.Meta.fields,
-                  'avatar', 'is_subscribed')
+                  'avatar', 'avatar_thumbnails', 'is_subscribed')
         read_only_fields = fields
 
 
 class FollowedUserSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True
-    )
 
     class Meta:
         model = User
@@ -256,12 +382,26 @@ class FollowedUserSerializer(UserSerializer):
                   'recipes', 'recipes_count')
         read_only_fields = fields
 
+    @staticmethod
+    def get_recipes_limit(request):
+        try:
+            limit = int(request.GET['recipes_limit'])
+        except (KeyError, ValueError):
+            return None
+        return limit if limit >= 0 else None
+
     def get_recipes(self, obj):
+        # UserWithSubscriptionViewSet.subscriptions подгружает превью
+        # рецептов одним оконным запросом в preview_recipes
+        if hasattr(obj, 'preview_recipes'):
+            recipes = obj.preview_recipes
+        else:
+            recipes = obj.recipes.all()
+            limit = self.get_recipes_limit(self.context['request'])
+            if limit is not None:
+                recipes = recipes[:limit]
         return ShortRecipeSerializer(
-            obj.recipes.all()[
-                :int(self.context['request'].
-                     GET.get('recipes_limit', 10 ** 10))
-            ],
+            recipes,
             many=True,
             context=self.context
         ).data
@@ -0,0 +1,197 @@
+# backend/api/shopping_list.py
+# Потоковая выгрузка списка покупок в txt, csv и pdf.
+# Данные читаются итераторами, файл собирается построчно,
+# поэтому память не зависит от размера корзины.
+
+import csv
+import textwrap
+
+from django.db.models import F
+from django.utils.formats import date_format
+from django.utils.text import capfirst
+from django.utils.timezone import now
+
+from food.models import Recipe, ShoppingCartTotal
+
+CHUNK_SIZE = 500
+
+
+def get_ingredients(user):
+    return ShoppingCartTotal.objects.filter(
+        user=user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit',
+        total_amount=F('amount'),
+    ).order_by('ingredient__name').iterator(chunk_size=CHUNK_SIZE)
+
+
+def get_recipes(user):
+    return Recipe.objects.filter(
+        shoppingcartitems__user=user
+    ).select_related('author').only(
+        'name', 'author__username'
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def text_lines(user):
+    yield f'Список покупок для {user.get_full_name() or user.username}'
+    yield f'Дата: {date_format(now().date())}'
+    yield ''
+    yield '🛒 Ингредиенты:'
+    for number, item in enumerate(get_ingredients(user), start=1):
+        yield (
+            f'{number}. {capfirst(item["ingredient__name"])} '
+            f'({item["ingredient__measurement_unit"]}) '
+            f'— {item["total_amount"]}'
+        )
+    yield ''
+    yield '📖 Рецепты:'
+    for recipe in get_recipes(user):
+        yield f'• {recipe.name} — @{recipe.author.username}'
+
+
+def render_txt(user):
+    for line in text_lines(user):
+        yield f'{line}\n'.encode()
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(user):
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        ('Продукт', 'Единица измерения', 'Количество')).encode()
+    for item in get_ingredients(user):
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['total_amount'],
+        )).encode()
+
+
+# PDF собирается без внешних библиотек стандартным шрифтом Helvetica.
+# Кириллица кодируется в cp1251, а /Differences сопоставляет байты
+# с именами глифов Adobe (afii100xx).
+PDF_ENCODING = 'cp1251'
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 в пунктах
+MARGIN = 50
+FONT_SIZE = 11
+LEADING = 15
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+LINE_WIDTH = 85  # символов
+
+
+def glyph_name(char):
+    code = ord(char)
+    if char == 'Ё':
+        return 'afii10023'
+    if char == 'ё':
+        return 'afii10071'
+    # в нумерации afii после Е идёт Ё, остальные буквы сдвинуты на один
+    if 0x410 <= code <= 0x42F:
+        offset = code - 0x410
+        return f'afii{10017 + offset + (offset >= 6)}'
+    if 0x430 <= code <= 0x44F:
+        offset = code - 0x430
+        return f'afii{10065 + offset + (offset >= 6)}'
+    return {
+        '—': 'emdash', '–': 'endash', '•': 'bullet', '№': 'afii61352',
+        '«': 'guillemotleft', '»': 'guillemotright',
+    }.get(char)
+
+
+def pdf_differences():
+    items = []
+    for code in range(0x80, 0x100):
+        char = bytes([code]).decode(PDF_ENCODING, 'ignore')
+        name = char and glyph_name(char)
+        if name:
+            items.append(f'{code} /{name}')
+    return ' '.join(items)
+
+
+def pdf_string(line):
+    data = line.encode(PDF_ENCODING, 'ignore').strip()
+    for char in (b'\\', b'(', b')'):
+        data = data.replace(char, b'\\' + char)
+    return b'(' + data + b')'
+
+
+def pdf_pages(lines):
+    page = []
+    for line in lines:
+        for part in textwrap.wrap(line, LINE_WIDTH) or ['']:
+            page.append(part)
+            if len(page) == LINES_PER_PAGE:
+                yield page
+                page = []
+    if page:
+        yield page
+
+
+def render_pdf(user):
+    # объекты 1-3 фиксированы, дерево страниц (2) пишется в конце,
+    # когда известны все страницы
+    offsets = {}
+    position = 0
+
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position += len(header)
+    yield header
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    yield write_object(3, (
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+        '/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+        f'/Differences [{pdf_differences()}] >> >>'
+    ).encode())
+
+    kids = []
+    number = 3
+    for page in pdf_pages(text_lines(user)):
+        content = b'BT /F1 %d Tf %d TL %d %d Td ' % (
+            FONT_SIZE, LEADING, MARGIN, PAGE_HEIGHT - MARGIN)
+        content += b' T* '.join(pdf_string(line) + b' Tj' for line in page)
+        content += b' ET'
+        number += 2
+        yield write_object(number - 1, b'<< /Length %d >>\nstream\n%s\n'
+                                       b'endstream' % (len(content), content))
+        yield write_object(number, (
+            '<< /Type /Page /Parent 2 0 R '
+            f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            '/Resources << /Font << /F1 3 0 R >> >> '
+            f'/Contents {number - 1} 0 R >>'
+        ).encode())
+        kids.append(f'{number} 0 R')
+
+    yield write_object(2, (
+        f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+    ).encode())
+
+    xref = position
+    size = number + 1
+    yield f'xref\n0 {size}\n0000000000 65535 f \n'.encode()
+    for obj in range(1, size):
+        yield f'{offsets[obj]:010d} 00000 n \n'.encode()
+    yield (
+        f'trailer\n<< /Size {size} /Root 1 0 R >>\n'
+        f'startxref\n{xref}\n%%EOF\n'
+    ).encode()
+
+
+EXPORTS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
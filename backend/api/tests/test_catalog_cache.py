@@ -0,0 +1,67 @@
+# Ответ справочника из кеша не обращается к БД: версии моделей процесс
+# помнит VERSION_CACHE_TTL секунд (food.cache).
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from food.models import Ingredient, Tag
+
+
+@override_settings(VERSION_CACHE_TTL=60)
+class CatalogCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+
+    def setUp(self):
+        # ответы, закешированные другими тестами, могут быть записаны
+        # под той же версией: база откатывается, а память процесса нет
+        cache.clear()
+        self.client = APIClient()
+
+    def names(self, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        return [tag['name'] for tag in response.json()]
+
+    def test_cached_tags_without_queries(self):
+        self.client.get('/api/tags/')  # заполняет кеш
+        self.assertEqual(self.names(queries=0), ['Завтрак'])
+
+    def test_change_resets_cache(self):
+        self.client.get('/api/tags/')  # заполняет кеш
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Обед', slug='lunch')
+        self.assertEqual(self.names(queries=1), ['Завтрак', 'Обед'])
+        self.assertEqual(self.names(queries=0), ['Завтрак', 'Обед'])
+
+
+@override_settings(VERSION_CACHE_TTL=60, INGREDIENT_SEARCH_INDEX=True)
+class IngredientSearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Сахар', 'Сахарная пудра', 'Тростниковый сахар')
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def names(self, query, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(f'/api/ingredients/?name={query}')
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()]
+
+    def test_search_from_index_without_queries(self):
+        # первый поиск после изменения продуктов строит индекс
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.names('са', queries=1)
+        self.assertEqual(
+            self.names('сах', queries=0),
+            ['Сахар', 'Сахарная пудра', 'Тростниковый сахар'],
+        )
@@ -0,0 +1,95 @@
+# Импорт справочников: потоковое чтение JSON на любых границах кусков,
+# продукт находится по названию и обновляется при смене единицы.
+
+import io
+import json
+
+from django.test import TestCase
+
+from food.catalog_import import import_catalog, iter_json, read_json
+from food.management.commands import load_ingredients_json, load_tags_json
+from food.models import Ingredient, Tag
+
+INGREDIENTS = load_ingredients_json.Command.catalog
+TAGS = load_tags_json.Command.catalog
+
+
+def import_json(catalog, items, batch_size=1000):
+    return import_catalog(
+        catalog, read_json(io.StringIO(json.dumps(items)), catalog.fields),
+        batch_size=batch_size)
+
+
+class IterJsonTestCase(TestCase):
+    def read(self, text, chunk_size):
+        return [item for _, item in iter_json(io.StringIO(text), chunk_size)]
+
+    def test_numbers_split_across_chunks(self):
+        text = '[4.5e3, -12, 7, 1E-2, 0.25, {"a": 1.5e2}, true, "x", 3]'
+        for chunk_size in range(1, 7):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    self.read(text, chunk_size), json.loads(text))
+
+    def test_number_at_end_of_file(self):
+        for chunk_size in range(1, 7):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.read('[1, 4.5e3]', chunk_size),
+                                 [1, 4500.0])
+
+    def test_invalid_json(self):
+        for text in ('{"a": 1}', '[4., 1]', '[1 2]', '[1, '):
+            for chunk_size in (1, 4, 1024):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError):
+                        self.read(text, chunk_size)
+
+
+class ImportCatalogTestCase(TestCase):
+    def test_repeated_import_skips_unchanged(self):
+        items = [
+            {'name': 'Соль', 'measurement_unit': 'г'},
+            {'name': 'Молоко', 'measurement_unit': 'мл'},
+        ]
+        report = import_json(INGREDIENTS, items)
+        self.assertEqual((report.inserted, report.updated), (2, 0))
+        report = import_json(INGREDIENTS, items)
+        self.assertEqual(
+            (report.inserted, report.updated, report.skipped), (0, 0, 2))
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_unit_change_updates_ingredient(self):
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='кг')
+        for batch_size in (1, 1000):
+            with self.subTest(batch_size=batch_size):
+                unit = 'г' if batch_size == 1 else 'щепотка'
+                report = import_json(INGREDIENTS, [
+                    {'name': 'Соль', 'measurement_unit': unit},
+                    {'name': f'Перец {batch_size}',
+                     'measurement_unit': 'г'},
+                ], batch_size=batch_size)
+                self.assertEqual((report.inserted, report.updated), (1, 1))
+                self.assertEqual(
+                    list(Ingredient.objects.filter(
+                        name='Соль').values_list('pk', 'measurement_unit')),
+                    [(salt.pk, unit)],
+                )
+
+    def test_invalid_rows_are_reported(self):
+        report = import_json(INGREDIENTS, [
+            {'name': '', 'measurement_unit': 'г'},
+            'Соль',
+            {'name': 'Сахар', 'measurement_unit': 'г'},
+        ])
+        self.assertEqual((report.inserted, report.invalid), (1, 2))
+        self.assertEqual([position for position, _ in report.errors],
+                         [1, 2])
+
+    def test_tag_name_is_updated_by_slug(self):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        report = import_json(TAGS, [
+            {'name': 'Утро', 'slug': 'breakfast'},
+            {'name': 'Обед', 'slug': 'lunch'},
+        ])
+        self.assertEqual((report.inserted, report.updated), (1, 1))
+        self.assertEqual(Tag.objects.get(slug='breakfast').name, 'Утро')
@@ -0,0 +1,39 @@
+# Условный GET рецепта: валидатор — только ETag, он меняется вместе
+# с тегами рецепта.
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from food.models import Recipe, Tag, User
+
+
+class RecipeConditionalTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com')
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Каша', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        cls.recipe.tags.set([cls.tag])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_tag_rename_changes_etag(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Ранний завтрак'
+            self.tag.save()
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['tags'][0]['name'], 'Ранний завтрак')
@@ -0,0 +1,118 @@
+# В режиме курсора (?cursor=) страницы идут в порядке, выбранном
+# параметром ordering, и совпадают с постраничной выдачей.
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from food.models import Recipe, User
+
+
+class CursorOrderingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com')
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                image='recipes/test.png',
+                cooking_time=1 + number * 7 % 5,
+                popularity=number * 13 % 10,
+            )
+            for number in range(20)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def walk(self, url):
+        ids = []
+        while url:
+            page = self.ids(url)
+            ids += [recipe['id'] for recipe in page['results']]
+            url = page['next']
+        return ids
+
+    def test_cursor_follows_ordering(self):
+        for ordering in ('new', 'popular', 'quick'):
+            with self.subTest(ordering=ordering):
+                expected = [
+                    recipe['id'] for recipe in self.ids(
+                        f'/api/recipes/?ordering={ordering}&limit=100'
+                    )['results']
+                ]
+                self.assertEqual(
+                    self.walk(
+                        f'/api/recipes/?ordering={ordering}&cursor=&limit=3'),
+                    expected,
+                )
+
+    def test_cursor_rejects_search_relevance(self):
+        response = self.client.get('/api/recipes/?search=рецепт&cursor=')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+        self.assertEqual(
+            self.client.get('/api/recipes/?search=рецепт').status_code, 200)
+
+
+class CursorTiesTestCase(TestCase):
+    """Больше offset_cutoff рецептов с одинаковым значением сортировки."""
+
+    RECIPES_COUNT = 1300
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com')
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                image='recipes/test.png',
+                cooking_time=30,
+            )
+            for number in range(cls.RECIPES_COUNT)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def walk(self, url, link):
+        ids = []
+        pages = 0
+        while url:
+            pages += 1
+            self.assertLessEqual(pages, self.RECIPES_COUNT // 100 + 1)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            ids += [recipe['id'] for recipe in page['results']]
+            last = url
+            url = page[link]
+        return ids, last
+
+    def test_tied_cursor_pages(self):
+        expected = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True))
+        for ordering in ('quick', 'popular'):
+            with self.subTest(ordering=ordering):
+                ids, last = self.walk(
+                    f'/api/recipes/?ordering={ordering}&cursor=&limit=100',
+                    'next')
+                self.assertEqual(ids, expected)
+                # обратно по ссылкам previous с последней страницы
+                back, _ = self.walk(last, 'previous')
+                self.assertEqual(
+                    back, [
+                        recipe_id
+                        for start in range(1200, -1, -100)
+                        for recipe_id in expected[start:start + 100]
+                    ])
@@ -0,0 +1,48 @@
+# Голова ленты подписок в кеше сбрасывается после фиксации транзакции
+# при публикации рецепта и при изменении подписок.
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from food.models import Follow, Recipe, User
+
+
+@override_settings(FEED_HEAD_CACHE_TIMEOUT=600)
+class FeedHeadTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com')
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def feed(self):
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def publish(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                author=self.author, name=name, text='Описание',
+                image='recipes/test.png', cooking_time=10)
+
+    def test_follow_publish_unfollow(self):
+        self.publish('Каша')
+        self.assertEqual(self.feed(), [])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            follow = Follow.objects.create(
+                follower=self.reader, author=self.author)
+        self.assertTrue(callbacks)
+        self.assertEqual(self.feed(), ['Каша'])
+        self.publish('Суп')
+        self.assertEqual(self.feed(), ['Суп', 'Каша'])
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.delete()
+        self.assertEqual(self.feed(), [])
@@ -0,0 +1,81 @@
+# Ограничения декодера изображений из data URI (library.base64ImageField):
+# размер, число пикселей и бомбы распаковки отклоняются с кодами ошибок.
+
+import base64
+import io
+import struct
+import zlib
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from library.base64ImageField import Base64ImageField
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def png_bomb(width, height):
+    """Крошечный PNG, в заголовке которого указан огромный размер."""
+    data = bytearray(png(1, 1))
+    # за сигнатурой (8 байт) идёт IHDR: длина, тип, ширина, высота, ...
+    struct.pack_into('>II', data, 16, width, height)
+    struct.pack_into('>I', data, 29, zlib.crc32(data[12:29]))
+    return bytes(data)
+
+
+def data_url(content, media_type='image/png'):
+    return (f'data:{media_type};base64,'
+            + base64.b64encode(content).decode())
+
+
+class Base64ImageFieldTestCase(SimpleTestCase):
+    def decode(self, data):
+        return Base64ImageField().to_internal_value(data)
+
+    def assert_rejected(self, data, code):
+        with self.assertRaises(ValidationError) as raised:
+            self.decode(data)
+        self.assertEqual(raised.exception.get_codes(), [code])
+
+    def test_valid_image(self):
+        file = self.decode(data_url(png(4, 3)))
+        self.assertTrue(file.name.endswith('.png'))
+        self.assertEqual(file.content_type, 'image/png')
+        with Image.open(file) as image:
+            self.assertEqual(image.size, (4, 3))
+
+    def test_oversized_payload(self):
+        content = png(64, 64)
+        with override_settings(IMAGE_UPLOAD_MAX_SIZE=len(content) - 1):
+            self.assert_rejected(data_url(content), 'too_large')
+        with override_settings(IMAGE_UPLOAD_MAX_SIZE=len(content)):
+            self.assertEqual(self.decode(data_url(content)).size,
+                             len(content))
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100)
+    def test_too_many_pixels(self):
+        self.assert_rejected(data_url(png(11, 10)), 'too_many_pixels')
+        self.decode(data_url(png(10, 10)))
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=10 ** 12)
+    def test_decompression_bomb(self):
+        # лимит настроек выше, отклоняет сам Pillow при открытии
+        self.assert_rejected(
+            data_url(png_bomb(50_000, 50_000)), 'too_many_pixels')
+
+    def test_bomb_over_pixel_limit(self):
+        self.assert_rejected(
+            data_url(png_bomb(6_000, 6_000)), 'too_many_pixels')
+
+    def test_invalid_data(self):
+        self.assert_rejected('data:image/png;base64,###', 'invalid_base64')
+        self.assert_rejected('data:image/png,abc', 'invalid_base64')
+        self.assert_rejected(
+            data_url(b'<svg></svg>', 'image/svg+xml'), 'unsupported_format')
+        self.assert_rejected(
+            data_url(png(4, 4)[:40]), 'invalid_image')
@@ -0,0 +1,104 @@
+# Подбор рецептов по продуктам: после правки состава рецепта индекс,
+# исправленный на месте, отвечает так же, как собранный заново.
+
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from food.matching import RecipeMatcher
+from food.models import Ingredient, Recipe, RecipeIngredient, User
+
+
+@override_settings(VERSION_CACHE_TTL=0)
+class RecipeMatcherTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Продукт {number}', measurement_unit='г')
+            for number in range(5)
+        )
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {number}', text='Описание',
+                   image='recipes/test.png', cooking_time=10)
+            for number in range(3)
+        )
+        first, second, third, *_ = cls.ingredients
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe, ingredient in (
+                (cls.recipes[0], first), (cls.recipes[0], second),
+                (cls.recipes[1], second), (cls.recipes[1], third),
+                (cls.recipes[2], first),
+            )
+        )
+
+    def setUp(self):
+        self.matcher = RecipeMatcher()
+
+    def set_ingredients(self, recipe, ingredients):
+        RecipeIngredient.objects.filter(recipe=recipe).delete()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        self.matcher.recipe_changed(recipe.id)
+
+    def assert_matches_rebuilt(self):
+        ids = [ingredient.id for ingredient in self.ingredients]
+        for have in (ids[:1], ids[:2], ids[1:3], ids[3:], ids):
+            with self.subTest(have=have):
+                self.assertEqual(self.matcher.match(have, 10),
+                                 RecipeMatcher().match(have, 10))
+
+    def test_patched_index_matches_rebuilt(self):
+        first, second, third, fourth, fifth = self.ingredients
+        self.assert_matches_rebuilt()
+        snapshot = self.matcher._index
+        before = self.matcher.match([first.id], 10)
+
+        self.set_ingredients(self.recipes[0], [second, fourth, fifth])
+        # индекс исправлен, а не сброшен, прежний снимок не изменился
+        self.assertIsNotNone(self.matcher._index)
+        self.assertIsNot(self.matcher._index, snapshot)
+        self.assertEqual(self.matcher._index.count, snapshot.count + 1)
+        self.assertEqual(
+            self.matcher._index.version, self.matcher._fresh_index().version)
+        self.assertEqual(
+            set(snapshot.ingredients[self.recipes[0].id]),
+            {first.id, second.id})
+        self.assertEqual(before, [
+            (self.recipes[2].id, 1.0, []),
+            (self.recipes[0].id, 0.5, [second.id]),
+        ])
+        self.assert_matches_rebuilt()
+        self.assertEqual(self.matcher.match([fourth.id], 10), [
+            (self.recipes[0].id, 1 / 3, [second.id, fifth.id]),
+        ])
+
+        self.set_ingredients(self.recipes[2], [])
+        self.set_ingredients(self.recipes[1], [third])
+        self.assert_matches_rebuilt()
+        self.assertEqual(self.matcher.match([first.id], 10), [])
+
+    def test_new_recipe_is_added(self):
+        first, second, *_ = self.ingredients
+        self.assert_matches_rebuilt()
+        recipe = Recipe.objects.create(
+            author=self.recipes[0].author, name='Новый', text='Описание',
+            image='recipes/test.png', cooking_time=5)
+        self.set_ingredients(recipe, [first, second])
+        self.assert_matches_rebuilt()
+        self.assertEqual(self.matcher.match([first.id, second.id], 1), [
+            (recipe.id, 1.0, []),
+        ])
+
+    @mock.patch('food.matching.COMPACT_SIZE', 2)
+    def test_many_edits(self):
+        self.assert_matches_rebuilt()
+        for number in range(12):
+            recipe = self.recipes[number % len(self.recipes)]
+            self.set_ingredients(
+                recipe, self.ingredients[number % 3:number % 3 + 2])
+            self.assert_matches_rebuilt()
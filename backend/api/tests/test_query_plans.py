@@ -0,0 +1,72 @@
+# Горячие запросы должны идти по индексам (миграция 0006): тест падает,
+# если в плане появляется полный просмотр таблицы.
+
+import re
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+
+from food.models import Favorite, Follow, Recipe, RecipeIngredient, Tag, User
+
+# SQLite: поиск по индексу — SEARCH, SCAN — полный просмотр таблицы
+# или всего индекса (USING COVERING INDEX тоже читает его целиком)
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)')
+POSTGRESQL_FULL_SCAN = re.compile(r'\bSeq Scan on\b')
+
+
+@skipUnless(
+    connection.vendor in ('sqlite', 'postgresql'),
+    'EXPLAIN разбирается только для SQLite и PostgreSQL',
+)
+class QueryPlanTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com')
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com')
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Каша', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        Follow.objects.create(follower=cls.user, author=cls.author)
+
+    def assertNoFullScan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # на маленьких таблицах PostgreSQL всегда выбирает Seq Scan,
+            # без него полный просмотр останется только там, где нет индекса
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            pattern = POSTGRESQL_FULL_SCAN
+        else:
+            pattern = SQLITE_FULL_SCAN
+        plan = queryset.explain()
+        self.assertFalse(
+            [line for line in plan.splitlines() if pattern.search(line)],
+            f'полный просмотр таблицы:\n{plan}',
+        )
+
+    def test_tag_filter(self):
+        self.assertNoFullScan(
+            Recipe.objects.filter(tags__slug=self.tag.slug).order_by('-id'))
+
+    def test_subscriptions(self):
+        self.assertNoFullScan(User.objects.filter(
+            pk__in=Follow.objects.filter(
+                follower=self.user).values_list('author__id', flat=True)
+        ))
+
+    def test_cart_aggregation(self):
+        self.assertNoFullScan(RecipeIngredient.objects.filter(
+            recipe__shoppingcartitems__user=self.user
+        ).values(
+            'ingredient__name', 'ingredient__measurement_unit'
+        ).annotate(
+            total_amount=Sum('amount')
+        ).order_by('ingredient__name'))
+
+    def test_favorites_by_recipe(self):
+        self.assertNoFullScan(
+            Favorite.objects.filter(recipe=self.recipe).values('user_id'))
@@ -0,0 +1,118 @@
+# Число запросов к БД при выдаче рецептов не должно зависеть от числа
+# рецептов на странице (флаги пользователя — аннотации, а не запросы
+# на каждый рецепт).
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from food.cache import get_versions
+from food.models import (Favorite, Follow, Ingredient, Recipe,
+                         RecipeIngredient, ShoppingCartItem, Tag, User)
+
+RECIPES_COUNT = 120
+# пользователь берётся из force_authenticate, без запроса к БД,
+# версии моделей для ETag — из памяти процесса (food.cache):
+# версия пользователя для ETag, COUNT(*) пагинации и выборка рецептов
+# с флагами, теги, продукты
+LIST_QUERIES = 5
+# строка для ETag, рецепт с флагами, теги, продукты
+DETAIL_QUERIES = 4
+
+
+@override_settings(VERSION_CACHE_TTL=60)
+class RecipeQueriesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Тестовый')
+        authors = User.objects.bulk_create(
+            User(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Автор', last_name=str(number),
+            )
+            for number in range(3)
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Продукт {number}', measurement_unit='г')
+            for number in range(5)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}',
+                text='Описание',
+                image='recipes/test.png',
+                cooking_time=number + 1,
+            )
+            for number in range(RECIPES_COUNT)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes
+            for tag in tags[:1 + recipe.id % len(tags)]
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for recipe in recipes
+            for ingredient in ingredients[:1 + recipe.id % len(ingredients)]
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::2])
+        ShoppingCartItem.objects.bulk_create(
+            ShoppingCartItem(user=cls.user, recipe=recipe)
+            for recipe in recipes[::3])
+        Follow.objects.create(follower=cls.user, author=authors[0])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # версии создаются и запоминаются при первом чтении
+        get_versions(Recipe, RecipeIngredient, Tag, Ingredient, User,
+                     (User, self.user.id))
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        small = self.get('/api/recipes/?limit=6', LIST_QUERIES)
+        large = self.get('/api/recipes/?limit=100', LIST_QUERIES)
+        self.assertEqual(len(small['results']), 6)
+        self.assertEqual(len(large['results']), 100)
+
+    def test_list(self):
+        recipes = self.get('/api/recipes/', LIST_QUERIES)['results']
+        self.assertTrue(all(
+            recipe['author']['is_subscribed']
+            == (recipe['author']['username'] == 'author0')
+            for recipe in recipes
+        ))
+
+    def test_detail(self):
+        recipe = Recipe.objects.filter(author__username='author0').first()
+        data = self.get(f'/api/recipes/{recipe.id}/', DETAIL_QUERIES)
+        self.assertTrue(data['author']['is_subscribed'])
+        self.assertEqual(
+            len(data['ingredients']), recipe.ingredients.count())
+
+    def test_favorites_filter(self):
+        recipes = self.get(
+            '/api/recipes/?is_favorited=1&limit=100', LIST_QUERIES)['results']
+        self.assertTrue(recipes)
+        self.assertTrue(all(recipe['is_favorited'] for recipe in recipes))
+
+    def test_shopping_cart_filter(self):
+        recipes = self.get(
+            '/api/recipes/?is_in_shopping_cart=1&limit=100', LIST_QUERIES
+        )['results']
+        self.assertTrue(recipes)
+        self.assertTrue(
+            all(recipe['is_in_shopping_cart'] for recipe in recipes))
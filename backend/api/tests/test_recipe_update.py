@@ -0,0 +1,115 @@
+# Изменение рецепта: теги и продукты обязательны и в PATCH, состав
+# меняется по разнице с сохранённым, итоги корзин остаются верными.
+
+import base64
+import io
+
+from django.test import TestCase
+from PIL import Image
+from rest_framework.test import APIClient
+
+from food import shopping_cart
+from food.models import (Ingredient, Recipe, RecipeIngredient,
+                         ShoppingCartItem, ShoppingCartTotal, Tag, User)
+
+
+def png_data_url():
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+def stored_totals():
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in
+        ShoppingCartTotal.objects.values_list(
+            'user_id', 'ingredient_id', 'amount')
+    }
+
+
+class RecipeUpdateTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com')
+        cls.buyer = User.objects.create_user(
+            username='buyer', email='buyer@example.com')
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.groats, cls.milk, cls.salt = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Крупа', 'Молоко', 'Соль')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Каша', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        cls.recipe.tags.set([cls.tag])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=cls.recipe, ingredient=cls.groats, amount=100),
+            RecipeIngredient(
+                recipe=cls.recipe, ingredient=cls.milk, amount=200),
+        ])
+        ShoppingCartItem.objects.create(user=cls.buyer, recipe=cls.recipe)
+        shopping_cart.rebuild()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                f'/api/recipes/{self.recipe.id}/', data, format='json')
+
+    def test_patch_requires_ingredients(self):
+        response = self.patch(
+            {'name': 'Овсянка', 'tags': [self.tag.id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ingredients', response.json())
+
+    def test_patch_requires_tags(self):
+        response = self.patch({
+            'name': 'Овсянка',
+            'ingredients': [{'id': self.groats.id, 'amount': 100}],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.json())
+
+    def test_patch_updates_ingredients_by_difference(self):
+        kept = RecipeIngredient.objects.get(
+            recipe=self.recipe, ingredient=self.groats)
+        response = self.patch({
+            'tags': [self.tag.id],
+            # крупа меняется, молоко удаляется, соль добавляется
+            'ingredients': [
+                {'id': self.groats.id, 'amount': 150},
+                {'id': self.salt.id, 'amount': 5},
+            ],
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            dict(RecipeIngredient.objects.filter(
+                recipe=self.recipe).values_list('ingredient_id', 'amount')),
+            {self.groats.id: 150, self.salt.id: 5},
+        )
+        # изменённая строка обновлена на месте, а не пересоздана
+        self.assertTrue(RecipeIngredient.objects.filter(
+            pk=kept.pk, amount=150).exists())
+        self.assertEqual(stored_totals(), {
+            (self.buyer.id, self.groats.id): 150,
+            (self.buyer.id, self.salt.id): 5,
+        })
+        self.assertEqual(shopping_cart.find_mismatches(), {})
+
+    def test_create_requires_tags(self):
+        response = self.client.post('/api/recipes/', {
+            'name': 'Суп',
+            'text': 'Описание',
+            'cooking_time': 20,
+            'image': png_data_url(),
+            'ingredients': [{'id': self.groats.id, 'amount': 50}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.json())
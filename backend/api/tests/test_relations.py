@@ -0,0 +1,69 @@
+# Удаление из избранного, корзины и подписок: счётчики и итоги корзин
+# меняются, только если запись действительно удалена.
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from food import counters, shopping_cart
+from food.models import (Favorite, Follow, Ingredient, Recipe,
+                         RecipeIngredient, ShoppingCartItem, User)
+
+
+class RelationDeleteTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other, cls.author = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com')
+            for name in ('user', 'other', 'author')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Каша', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, amount=100,
+            ingredient=Ingredient.objects.create(
+                name='Крупа', measurement_unit='г'))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, url):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url)
+
+    def test_recipe_relations(self):
+        for model, action, counter in (
+            (Favorite, 'favorite', 'favorites_count'),
+            (ShoppingCartItem, 'shopping_cart', 'carts_count'),
+        ):
+            with self.subTest(action=action):
+                url = f'/api/recipes/{self.recipe.id}/{action}/'
+                model.objects.create(user=self.other, recipe=self.recipe)
+                counters.recount()
+                self.assertEqual(self.request('post', url).status_code, 201)
+                self.assertEqual(self.request('delete', url).status_code, 204)
+                self.assertEqual(self.request('delete', url).status_code, 400)
+                self.assertEqual(
+                    self.request(
+                        'delete', f'/api/recipes/0/{action}/').status_code,
+                    404)
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 1)
+                self.assertEqual(shopping_cart.find_mismatches(), {})
+
+    def test_subscription(self):
+        Follow.objects.create(follower=self.other, author=self.author)
+        counters.recount()
+        url = f'/api/users/{self.author.id}/subscribe/'
+        self.assertEqual(self.request('post', url).status_code, 201)
+        self.assertEqual(self.request('delete', url).status_code, 204)
+        self.assertEqual(self.request('delete', url).status_code, 400)
+        self.assertEqual(
+            self.request('delete', '/api/users/0/subscribe/').status_code,
+            404)
+        self.author.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertEqual(self.user.following_count, 0)
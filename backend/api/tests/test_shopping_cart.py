@@ -0,0 +1,141 @@
+# Итоги корзин (ShoppingCartTotal) обновляются приращениями; после
+# каждого изменения они должны совпадать с подсчётом заново.
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from food import shopping_cart
+from food.models import (Ingredient, Recipe, RecipeIngredient,
+                         ShoppingCartItem, ShoppingCartTotal, User)
+
+
+class ShoppingCartTotalTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com')
+        cls.buyer = User.objects.create_user(
+            username='buyer', email='buyer@example.com')
+        cls.other_buyer = User.objects.create_user(
+            username='other', email='other@example.com')
+        cls.groats, cls.milk, cls.salt = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Крупа', 'Молоко', 'Соль')
+        )
+        cls.porridge, cls.soup = Recipe.objects.bulk_create(
+            Recipe(author=cls.author, name=name, text='Описание',
+                   image='recipes/test.png', cooking_time=10)
+            for name in ('Каша', 'Суп')
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=cls.porridge, ingredient=cls.groats, amount=100),
+            RecipeIngredient(
+                recipe=cls.porridge, ingredient=cls.milk, amount=200),
+            RecipeIngredient(
+                recipe=cls.soup, ingredient=cls.groats, amount=50),
+            RecipeIngredient(recipe=cls.soup, ingredient=cls.salt, amount=5),
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def cart(self, method, recipe, user=None):
+        self.client.force_authenticate(user or self.buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(
+                f'/api/recipes/{recipe.id}/shopping_cart/')
+
+    def assert_totals(self, expected):
+        self.assertEqual(shopping_cart.find_mismatches(), {})
+        self.assertEqual(
+            {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in
+                ShoppingCartTotal.objects.values_list(
+                    'user_id', 'ingredient_id', 'amount')
+            },
+            expected,
+        )
+
+    def test_add_and_remove_cart_items(self):
+        self.assertEqual(self.cart('post', self.porridge).status_code, 201)
+        self.assertEqual(self.cart('post', self.soup).status_code, 201)
+        self.assertEqual(
+            self.cart('post', self.soup, self.other_buyer).status_code, 201)
+        self.assert_totals({
+            (self.buyer.id, self.groats.id): 150,
+            (self.buyer.id, self.milk.id): 200,
+            (self.buyer.id, self.salt.id): 5,
+            (self.other_buyer.id, self.groats.id): 50,
+            (self.other_buyer.id, self.salt.id): 5,
+        })
+        # повторное добавление не меняет итоги
+        self.assertEqual(self.cart('post', self.soup).status_code, 400)
+        self.assertEqual(self.cart('delete', self.porridge).status_code, 204)
+        self.assert_totals({
+            (self.buyer.id, self.groats.id): 50,
+            (self.buyer.id, self.salt.id): 5,
+            (self.other_buyer.id, self.groats.id): 50,
+            (self.other_buyer.id, self.salt.id): 5,
+        })
+        self.assertEqual(self.cart('delete', self.porridge).status_code, 400)
+        self.assertEqual(self.cart('delete', self.soup).status_code, 204)
+        self.assert_totals({
+            (self.other_buyer.id, self.groats.id): 50,
+            (self.other_buyer.id, self.salt.id): 5,
+        })
+
+    def test_recipe_ingredient_edits(self):
+        ShoppingCartItem.objects.create(user=self.buyer, recipe=self.porridge)
+        ShoppingCartItem.objects.create(user=self.buyer, recipe=self.soup)
+        ShoppingCartItem.objects.create(
+            user=self.other_buyer, recipe=self.porridge)
+        groats = RecipeIngredient.objects.get(
+            recipe=self.porridge, ingredient=self.groats)
+        groats.amount = 120
+        groats.save()
+        # продукт в строке заменён другим
+        milk = RecipeIngredient.objects.get(
+            recipe=self.porridge, ingredient=self.milk)
+        milk.ingredient = self.salt
+        milk.amount = 3
+        milk.save()
+        RecipeIngredient.objects.filter(
+            recipe=self.soup, ingredient=self.salt).delete()
+        RecipeIngredient.objects.create(
+            recipe=self.soup, ingredient=self.milk, amount=300)
+        self.assert_totals({
+            (self.buyer.id, self.groats.id): 170,
+            (self.buyer.id, self.salt.id): 3,
+            (self.buyer.id, self.milk.id): 300,
+            (self.other_buyer.id, self.groats.id): 120,
+            (self.other_buyer.id, self.salt.id): 3,
+        })
+
+    def test_recipe_deletion(self):
+        self.cart('post', self.porridge)
+        self.cart('post', self.soup)
+        self.cart('post', self.porridge, self.other_buyer)
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/recipes/{self.porridge.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_totals({
+            (self.buyer.id, self.groats.id): 50,
+            (self.buyer.id, self.salt.id): 5,
+        })
+
+    def test_rebuild_matches_incremental_totals(self):
+        self.cart('post', self.porridge)
+        self.cart('post', self.soup, self.other_buyer)
+        incremental = list(ShoppingCartTotal.objects.order_by(
+            'user_id', 'ingredient_id').values_list(
+            'user_id', 'ingredient_id', 'amount'))
+        shopping_cart.rebuild()
+        self.assertEqual(
+            list(ShoppingCartTotal.objects.order_by(
+                'user_id', 'ingredient_id').values_list(
+                'user_id', 'ingredient_id', 'amount')),
+            incremental,
+        )
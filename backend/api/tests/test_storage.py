@@ -0,0 +1,97 @@
+# Хранилище с адресацией по содержимому: одинаковые картинки хранятся
+# одним файлом, файл удаляется после фиксации, только если на него
+# больше никто не ссылается.
+
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from food.models import Recipe, User
+from food.storage import content_storage
+
+IMAGE = b'\x89PNG\r\n\x1a\n' + b'picture' * 10
+OTHER_IMAGE = b'\x89PNG\r\n\x1a\n' + b'another' * 10
+
+
+class ContentStorageTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_recipe(self, content=IMAGE):
+        recipe = Recipe(
+            author=self.author, name='Каша', text='Описание',
+            cooking_time=10)
+        recipe.image.save('recipe.png', ContentFile(content), save=False)
+        recipe.save()
+        return recipe
+
+    def delete(self, *recipes):
+        with self.captureOnCommitCallbacks(execute=True):
+            for recipe in recipes:
+                recipe.delete()
+
+    def test_same_content_is_stored_once(self):
+        first = self.create_recipe()
+        second = self.create_recipe()
+        other = self.create_recipe(OTHER_IMAGE)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        with content_storage.open(first.image.name) as file:
+            self.assertEqual(file.read(), IMAGE)
+
+    def test_file_is_kept_while_referenced(self):
+        first = self.create_recipe()
+        second = self.create_recipe()
+        name = first.image.name
+        self.delete(first)
+        self.assertTrue(content_storage.exists(name))
+        self.delete(second)
+        self.assertFalse(content_storage.exists(name))
+
+    def test_delete_waits_for_commit(self):
+        recipe = self.create_recipe()
+        name = recipe.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+            # до фиксации файл на месте
+            self.assertTrue(content_storage.exists(name))
+        self.assertFalse(content_storage.exists(name))
+
+    def test_referenced_file_is_not_deleted(self):
+        recipe = self.create_recipe()
+        name = recipe.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.image.storage.delete(name)
+        # запись по-прежнему ссылается на файл
+        self.assertTrue(content_storage.exists(name))
+
+    def test_save_during_pending_delete_keeps_file(self):
+        first = self.create_recipe()
+        name = first.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+            # та же картинка сохранена до фиксации удаления
+            second = self.create_recipe()
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(content_storage.exists(name))
+
+    def test_save_after_delete_writes_file_again(self):
+        first = self.create_recipe()
+        name = first.image.name
+        self.delete(first)
+        self.assertFalse(content_storage.exists(name))
+        second = self.create_recipe()
+        self.assertEqual(second.image.name, name)
+        with content_storage.open(name) as file:
+            self.assertEqual(file.read(), IMAGE)
@@ -2,8 +2,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
-                       UserWithSubscriptionViewSet)
+from api.views import (IngredientViewSet, MetricsView, RecipeViewSet,
+                       TagViewSet, UserWithSubscriptionViewSet)
 
 api = DefaultRouter()
 
@@ -15,5 +15,6 @@ api.register(r'users', UserWithSubscriptionViewSet, basename='users')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('_metrics', MetricsView.as_view(), name='metrics'),
     path('', include(api.urls)),
 ]
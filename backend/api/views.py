@@ -1,12 +1,12 @@
-import os
+from urllib.parse import urlencode
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import Exists, OuterRef
-from django.http import FileResponse
-from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Value
+from django.http import Http404, StreamingHttpResponse
 from django.urls import reverse
-from django.utils.timezone import now
 from django_filters.filters import CharFilter
 from django_filters.filterset import FilterSet
 from django_filters.rest_framework.backends import DjangoFilterBackend
@@ -15,24 +15,94 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import (AllowAny, IsAuthenticated,
+from rest_framework.permissions import (AllowAny, IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from api.conditional import conditional_response, make_etag
 from api.filters import RecipeFilter
-from api.pagination import RecipePagination
+from api.metrics import registry
+from api.pagination import (RecipeCursorPagination, RecipePagination,
+                            SubscriptionCursorPagination, get_paginator)
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import (CSVShoppingListRenderer, PDFShoppingListRenderer,
+                           PrometheusRenderer, TextShoppingListRenderer)
 from api.serializers import (FollowedUserSerializer, FoodgramUserSerializer,
-                             IngredientSerializer, RecipeReadSerializer,
-                             RecipeWriteSerializer, ShortRecipeSerializer,
+                             IngredientSerializer,
+                             RecipeMatchRequestSerializer,
+                             RecipeMatchSerializer, RecipeReadSerializer,
+                             RecipeWriteSerializer,
+                             ShoppingCartTotalSerializer,
+                             ShortRecipeSerializer, SimilarRecipeSerializer,
                              TagSerializer)
+from api.shopping_list import EXPORTS
+from food import feed
+from food.cache import get_version, get_versions
+from food.counters import RELATION_COUNTERS, change_counter
+from food.ingredient_index import ingredient_index
+from food.matching import recipe_matcher
 from food.models import (Favorite, Follow, Ingredient, Recipe,
                          RecipeIngredient, ShoppingCartItem, Tag)
+from food.short_links import recipe_exists
+from food.similar import similar_recipes
 
 User = get_user_model()
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+def delete_locked(queryset):
+    """Удалить записи, вернуть, сколько удалено.
+
+    Записи выбираются с блокировкой (SELECT ... FOR UPDATE): из двух
+    одновременных DELETE второй дождётся первого и ничего не найдёт,
+    поэтому счётчики и сигналы (итоги корзин) срабатывают один раз.
+    Вызывать внутри transaction.atomic.
+    """
+    deleted, _ = queryset.select_for_update().delete()
+    return deleted
+
+
+class CachedCatalogMixin:
+    """Кеширует ответы справочника, ключ — параметры запроса.
+
+    Кеш сбрасывается сменой версии модели (food.cache.bump_version)
+    при любом изменении записей.
+    """
+
+    def get_cache_key(self, request, version=None):
+        model = self.queryset.model
+        if version is None:
+            version = get_version(model)
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        return (f'{model._meta.label_lower}:v{version}:'
+                f'{self.action}:{self.kwargs.get("pk", "")}:{params}')
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        key = self.get_cache_key(request)
+
+        def build():
+            data = cache.get(key)
+            if data is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                data = response.data
+                cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+            return Response(data)
+
+        return conditional_response(
+            request, make_etag(key, request.accepted_renderer.format), build)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs)
+
+
+class TagViewSet(CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [AllowAny]
@@ -47,13 +117,33 @@ class IngredientFilter(FilterSet):
         fields = ['name']
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
     pagination_class = None
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name and settings.INGREDIENT_SEARCH_INDEX:
+            try:
+                limit = int(request.query_params['limit'])
+            except (KeyError, ValueError):
+                limit = None
+            if limit is not None and limit < 1:
+                limit = None
+            # одна версия и для ETag, и для свежести индекса
+            version = get_version(Ingredient)
+            return conditional_response(
+                request,
+                make_etag(self.get_cache_key(request, version),
+                          request.accepted_renderer.format),
+                lambda: Response(
+                    ingredient_index.search(name, limit, version)),
+            )
+        return super().list(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
@@ -62,30 +152,96 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = get_paginator(self.request)
+        return self._paginator
+
     def get_queryset(self):
-        user = self.request.user
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients_in_recipe',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
 
-        is_in_cart = self.request.query_params.get('is_in_shopping_cart')
-        if is_in_cart and user.is_authenticated:
-            cart_subquery = ShoppingCartItem.objects.filter(
-                user=user,
-                recipe=OuterRef('pk')
-            )
-            queryset = queryset.annotate(
-                in_cart=Exists(cart_subquery)
-            ).filter(in_cart=True)
+        return self.annotate_user_flags(queryset)
 
-        return queryset
+    def annotate_user_flags(self, queryset):
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCartItem.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                follower=user, author=OuterRef('author'))),
+        )
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PUT', 'PATCH', 'DELETE']:
             return RecipeWriteSerializer
         return RecipeReadSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        # ETag из одной строки: метка изменения рецепта, выводимые поля
+        # автора и флаги текущего пользователя
+        state = None
+        if kwargs['pk'].isdigit():
+            state = self.annotate_user_flags(
+                Recipe.objects.filter(pk=kwargs['pk'])
+            ).values(
+                'updated', 'image_hash', 'author__username',
+                'author__email', 'author__first_name', 'author__last_name',
+                'author__avatar', 'author__avatar_hash', 'is_favorited',
+                'is_in_shopping_cart', 'author_is_subscribed',
+            ).first()
+        if state is None:
+            return super().retrieve(request, *args, **kwargs)
+        return conditional_response(
+            request,
+            make_etag(
+                state, *get_versions(Tag, Ingredient),
+                request.user.id, request.accepted_renderer.format,
+            ),
+            lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs),
+            per_user=True,
+        )
+
+    def list(self, request, *args, **kwargs):
+        user = request.user
+        # все версии одним запросом к хранилищу
+        versions = get_versions(
+            Recipe, RecipeIngredient, Tag, Ingredient, User,
+            *([(User, user.id)] if user.is_authenticated else []),
+        )
+        return conditional_response(
+            request,
+            make_etag(
+                *versions,
+                user.id,
+                sorted(request.query_params.lists()),
+                request.accepted_renderer.format,
+            ),
+            lambda: super(RecipeViewSet, self).list(
+                request, *args, **kwargs),
+            per_user=True,
+        )
+
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_short_link(self, request, pk=None):
-        if not Recipe.objects.filter(pk=pk).exists():
+        if not pk.isdigit() or not recipe_exists.exists(int(pk)):
             raise ValidationError(f"Рецепт с id={pk} не найден.")
         return Response(
             {'short-link': request.build_absolute_uri(
@@ -109,57 +265,124 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'image': ['Это поле обязательно.']},
                 status=status.HTTP_400_BAD_REQUEST)
 
-        # Сохраняем текущий путь старого аватара (если есть)
-        old_image_path = recipe.image.path if recipe.image else None
-
-        # Создаем новый файл аватара, не удаляя пока старый
+        # старый файл удалит django-cleanup, если на него
+        # больше никто не ссылается (food.storage)
         recipe.image = (
             RecipeReadSerializer().fields['image'].to_internal_value(image))
         recipe.save()
 
-        # Удаляем старый файл, если он был и отличается от нового
-        if old_image_path and os.path.isfile(old_image_path):
-            try:
-                # Проверяем, что новый файл не совпадает с удаляемым
-                if old_image_path != recipe.image.path:
-                    os.remove(old_image_path)
-            except Exception:
-                # На всякий случай подавляем ошибку удаления,
-                # чтобы не ломать ответ
-                pass
-
         return Response(
             {'image': recipe.image.url if recipe.image else None},
             status=status.HTTP_200_OK
         )
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
+            change_counter(User, self.request.user.pk, 'recipes_count', 1)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, recipe):
+        with transaction.atomic():
+            recipe.delete()
+            change_counter(User, recipe.author_id, 'recipes_count', -1)
 
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[JSONRenderer, TextShoppingListRenderer,
+                              CSVShoppingListRenderer,
+                              PDFShoppingListRenderer])
     def download_shopping_cart(self, request):
-        user = request.user
-        recipes = Recipe.objects.filter(
-            shoppingcartitems__user=user)
-
-        content = render_to_string('shopping_list.txt', {
-            'user': user,
-            'date': now().date(),
-            'ingredients': (
-                RecipeIngredient.objects.filter(
-                    recipe__in=recipes
-                ).values(
-                    'ingredient__name', 'ingredient__measurement_unit'
-                ).annotate(
-                    total_amount=models.Sum('amount')
-                ).order_by('ingredient__name')
+        renderer = request.accepted_renderer
+        if renderer.format not in EXPORTS:
+            renderer = TextShoppingListRenderer()
+        response = StreamingHttpResponse(
+            EXPORTS[renderer.format](request.user),
+            content_type=(
+                f'{renderer.media_type}; charset={renderer.charset}'
+                if renderer.charset else renderer.media_type
             ),
-            'recipes': recipes,
-        })
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"')
+        return response
 
-        return FileResponse(
-            content, as_attachment=True, filename='shopping_list.txt')
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        recipes = self.get_queryset()
+        paginator = RecipeCursorPagination()
+        if (
+            settings.FEED_HEAD_CACHE_TIMEOUT
+            and not request.query_params.get(paginator.cursor_query_param)
+        ):
+            # первая страница целиком внутри головы ленты
+            recipes = recipes.filter(
+                id__in=feed.get_head(request.user))
+        else:
+            recipes = feed.followed_recipes(recipes, request.user)
+        page = paginator.paginate_queryset(recipes, request, view=self)
+        return paginator.get_paginated_response(
+            self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    def match(self, request):
+        query = RecipeMatchRequestSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        ingredient_ids = set(query.validated_data['ingredients'])
+        matches = recipe_matcher.match(
+            ingredient_ids, query.validated_data['limit'])
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in matches])
+        return Response(RecipeMatchSerializer(
+            [
+                {
+                    'recipe': recipes[recipe_id],
+                    'coverage': coverage,
+                    'missing': [
+                        item for item in
+                        recipes[recipe_id].ingredients_in_recipe.all()
+                        if item.ingredient_id not in ingredient_ids
+                    ],
+                }
+                for recipe_id, coverage, _ in matches
+                if recipe_id in recipes
+            ],
+            many=True,
+            context={'request': request},
+        ).data)
+
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def similar(self, request, pk):
+        if not pk.isdigit():
+            raise Http404
+        pk = int(pk)
+        similar = similar_recipes.get(
+            pk, RecipePagination().get_page_size(request))
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_hash', 'cooking_time'
+        ).in_bulk([pk, *(recipe_id for recipe_id, _ in similar)])
+        if pk not in recipes:
+            raise Http404
+        result = []
+        for recipe_id, similarity in similar:
+            if recipe_id in recipes:
+                recipes[recipe_id].similarity = similarity
+                result.append(recipes[recipe_id])
+        return Response(SimilarRecipeSerializer(
+            result, many=True, context={'request': request}).data)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_summary(self, request):
+        return Response(ShoppingCartTotalSerializer(
+            request.user.shopping_cart_totals.select_related(
+                'ingredient').order_by('ingredient__name'),
+            many=True,
+        ).data)
 
     def handle_add_or_remove(self, model, recipe_id, request):
         if request.method not in {'POST', 'DELETE'}:
@@ -168,18 +391,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_405_METHOD_NOT_ALLOWED
             )
 
+        counter = RELATION_COUNTERS[model]
         if request.method == 'DELETE':
-            get_object_or_404(
-                model,
-                user=request.user,
-                recipe_id=recipe_id
-            ).delete()
+            with transaction.atomic():
+                deleted = delete_locked(model.objects.filter(
+                    user=request.user, recipe_id=recipe_id))
+                if deleted:
+                    change_counter(Recipe, recipe_id, counter, -1)
+            if not deleted:
+                get_object_or_404(Recipe, pk=recipe_id)
+                raise ValidationError(
+                    f'Рецепта с id={recipe_id} нет в '
+                    f'{model._meta.verbose_name_plural.lower()}.')
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         # if request.method == 'POST':
         recipe = get_object_or_404(Recipe, pk=recipe_id)
-        obj, created = model.objects.get_or_create(user=request.user,
-                                                   recipe=recipe)
+        with transaction.atomic():
+            obj, created = model.objects.get_or_create(user=request.user,
+                                                       recipe=recipe)
+            if created:
+                change_counter(Recipe, recipe.id, counter, 1)
         if not created:
             raise ValidationError(
                 f'Рецепт с id={recipe.id} '
@@ -246,17 +478,8 @@ class UserWithSubscriptionViewSet(UserViewSet):
                 {'avatar': user.avatar.url if user.avatar else None},
                 status=status.HTTP_200_OK)
 
-        # elif request.method == 'DELETE':
-        if (
-                user.avatar
-                and user.avatar.path
-                and os.path.isfile(user.avatar.path)
-        ):
-            try:
-                os.remove(user.avatar.path)
-            except Exception:
-                pass  # подавляем ошибки удаления
-
+        # файл удалит django-cleanup, если на него больше никто
+        # не ссылается (food.storage)
         user.avatar = None
         user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -270,10 +493,16 @@ class UserWithSubscriptionViewSet(UserViewSet):
         user = request.user
 
         if request.method == 'DELETE':
-            get_object_or_404(Follow,
-                              follower=request.user,
-                              author_id=pk
-                              ).delete()
+            with transaction.atomic():
+                deleted = delete_locked(
+                    Follow.objects.filter(follower=user, author_id=pk))
+                if deleted:
+                    change_counter(User, user.pk, 'following_count', -1)
+                    change_counter(User, pk, 'followers_count', -1)
+            if not deleted:
+                author = get_object_or_404(User, pk=pk)
+                raise ValidationError(
+                    f'Вы не подписаны на пользователя {author.username}')
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         # if request.method == 'POST':
@@ -282,8 +511,12 @@ class UserWithSubscriptionViewSet(UserViewSet):
         if user.id == author.id:
             raise ValidationError('Нельзя подписаться на самого себя')
 
-        _, created = Follow.objects.get_or_create(
-            follower=user, author=author)
+        with transaction.atomic():
+            _, created = Follow.objects.get_or_create(
+                follower=user, author=author)
+            if created:
+                change_counter(User, user.pk, 'following_count', 1)
+                change_counter(User, author.pk, 'followers_count', 1)
         if not created:
             raise ValidationError(
                 f'Вы уже подписаны на пользователя {author.username}')
@@ -296,12 +529,22 @@ class UserWithSubscriptionViewSet(UserViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def subscriptions(self, request):
+        recipes = Recipe.objects.all()
+        limit = FollowedUserSerializer.get_recipes_limit(request)
+        if limit is not None:
+            # срез в Prefetch выполняется одним запросом
+            # с ROW_NUMBER() по автору
+            recipes = recipes[:limit]
         authors = User.objects.filter(
             pk__in=Follow.objects
             .filter(follower=request.user)
             .values_list('author__id', flat=True)
+        ).annotate(
+            is_subscribed=Value(True),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='preview_recipes')
         )
-        paginator = RecipePagination()
+        paginator = get_paginator(request, SubscriptionCursorPagination)
         return paginator.get_paginated_response(
             FollowedUserSerializer(
                 paginator.paginate_queryset(authors, request),
@@ -309,3 +552,13 @@ class UserWithSubscriptionViewSet(UserViewSet):
                 context={'request': request}
             ).data
         )
+
+
+class MetricsView(APIView):
+    """Метрики запросов этого процесса (api.middleware)."""
+
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(registry.render())
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -86,6 +87,80 @@ else:
         }
     }
 
+# По умолчанию кеш в памяти процесса; для общего кеша между
+# воркерами gunicorn задайте REDIS_URL (нужен пакет redis)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'foodgram',
+        }
+    }
+
+# где хранятся версии кеша (food.cache): они должны быть общими для
+# воркеров и команд manage.py, поэтому без Redis — в таблице БД
+VERSION_STORE = os.getenv(
+    'VERSION_STORE', 'cache' if os.getenv('REDIS_URL') else 'database')
+# сколько секунд процесс верит прочитанной версии, не обращаясь
+# к хранилищу: на столько запаздывают изменения из других процессов
+VERSION_CACHE_TTL = float(os.getenv('VERSION_CACHE_TTL', 5))
+
+# время жизни закешированных ответов справочников (теги, продукты), сек
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# кеш головы ленты подписок (/api/recipes/feed/), 0 — не кешировать;
+# голову сбрасывает воркер, принявший изменение, поэтому по умолчанию
+# она кешируется только в общем кеше (REDIS_URL); с кешем в памяти
+# включать, только если воркер один
+FEED_HEAD_CACHE_TIMEOUT = int(os.getenv(
+    'FEED_HEAD_CACHE_TIMEOUT', 60 * 10 if os.getenv('REDIS_URL') else 0))
+
+# поиск продуктов по ?name= через индекс в памяти вместо запроса к БД
+INGREDIENT_SEARCH_INDEX = (
+    os.getenv('INGREDIENT_SEARCH_INDEX', 'True') == 'True')
+
+# кеш существования рецептов для коротких ссылок /s/<pk>/ (food.short_links):
+# число записей и их срок, сек, для найденных и отсутствующих рецептов
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10_000))
+SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', 60 * 10))
+SHORT_LINK_MISSING_CACHE_TTL = int(
+    os.getenv('SHORT_LINK_MISSING_CACHE_TTL', 30))
+# Cache-Control: max-age редиректа с короткой ссылки
+SHORT_LINK_REDIRECT_MAX_AGE = int(
+    os.getenv('SHORT_LINK_REDIRECT_MAX_AGE', 60 * 10))
+
+# замеры запросов (api.middleware): Server-Timing, /api/_metrics и лог
+# медленных запросов — дольше SLOW_REQUEST_MS, от SLOW_REQUEST_QUERIES
+# запросов к БД или с одним запросом, повторённым SLOW_REQUEST_DUPLICATES раз
+PERFORMANCE_METRICS = os.getenv('PERFORMANCE_METRICS', 'True') == 'True'
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', 50))
+SLOW_REQUEST_DUPLICATES = int(os.getenv('SLOW_REQUEST_DUPLICATES', 10))
+
+# потоков сборки миниатюр изображений, 0 — собирать в самом запросе
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# тело JSON-запроса с картинкой в base64, как client_max_body_size в nginx
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
+
+# ограничения изображений в base64 (library.base64ImageField):
+# размер после декодирования, байт, и число пикселей
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', 7 * 1024 * 1024))
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv('IMAGE_UPLOAD_MAX_PIXELS', 25_000_000))
+
+# каталог индекса похожих рецептов (manage.py build_similar_recipes)
+SIMILAR_RECIPES_DIR = os.getenv(
+    'SIMILAR_RECIPES_DIR', os.path.join(BASE_DIR, 'similar_recipes'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -1,11 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
-from django.db.models import Count
 from django.utils.safestring import mark_safe
 
 from .models import (Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCartItem, Tag, User)
+from .thumbnails import thumbnail_url
 
 admin.site.unregister(Group)
 
@@ -60,7 +60,7 @@ class RecipesCountMixin:
 
 
 @admin.register(User)
-class UserProfileAdmin(UserAdmin, RecipesCountMixin,):
+class UserProfileAdmin(UserAdmin):
     model = User
 
     list_display = (
@@ -72,7 +72,7 @@ class UserProfileAdmin(UserAdmin, RecipesCountMixin,):
         'following_count',
         'followers_count',
         'is_staff',
-        *RecipesCountMixin.list_display,
+        'recipes_count',
     )
     list_filter = (
         'is_staff',
@@ -84,14 +84,6 @@ class UserProfileAdmin(UserAdmin, RecipesCountMixin,):
         HasSubscribersFilter,  # кто читает пользователя
     )
 
-    @admin.display(description='Подписок')
-    def following_count(self, user):
-        return user.follower_followes.count()
-
-    @admin.display(description='Подписчиков')
-    def followers_count(self, author):
-        return author.author_followes.count()
-
     @admin.display(description='Полное имя')
     def full_name(self, user):
         return f'{user.first_name} {user.last_name}'
@@ -120,8 +112,12 @@ class UserProfileAdmin(UserAdmin, RecipesCountMixin,):
     @admin.display(description='Аватар')
     def avatar_preview(self, user):
         if user.avatar:
+            url = (
+                thumbnail_url(user.avatar_hash, 'avatar')
+                if user.avatar_hash else user.avatar.url
+            )
             return mark_safe(
-                f'<img src="{user.avatar.url}" width="40" height="40" '
+                f'<img src="{url}" width="40" height="40" '
                 f'style="object-fit: cover; border-radius: 4px;" />'
             )
         return '-'
@@ -231,15 +227,9 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientInline,)
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(
-            _favorites_count=Count(
-                'favorites', distinct=True)
-        )
-
-    @admin.display(description='В избранном')
-    def favorites_count(self, recipe):
-        return recipe._favorites_count
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related('tags', 'ingredients_in_recipe__ingredient')
 
     @admin.display(description='Продукты')
     def products_list(self, recipe):
@@ -255,8 +245,12 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description='Изображение')
     def image_tag(self, recipe):
+        url = (
+            thumbnail_url(recipe.image_hash, 'list')
+            if recipe.image_hash else recipe.image.url
+        )
         return mark_safe(
-            f'<img src="{recipe.image.url}" '
+            f'<img src="{url}" '
             f'style="height: 50px; object-fit: cover; border-radius: 4px;" />'
         )
         return ''
@@ -0,0 +1,123 @@
+# backend/food/cache.py
+# Версии кеша справочников: ключи ответов содержат номер версии модели,
+# поэтому для сброса кеша достаточно увеличить этот номер.
+# Версии должны быть общими для всех процессов (воркеры gunicorn,
+# команды manage.py), поэтому без Redis они хранятся в таблице
+# CacheVersion, а не в кеше в памяти процесса (VERSION_STORE).
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from food.models import CacheVersion
+
+# сколько версий помнить в памяти процесса, больше — память сбрасывается
+LOCAL_VERSIONS_SIZE = 1000
+
+# key -> (версия, до какого time.monotonic() ей верить)
+_local_versions = {}
+
+
+def version_key(model, scope=None):
+    # scope — своя версия для части записей, например одного пользователя
+    if scope is None:
+        return f'{model._meta.label_lower}:version'
+    return f'{model._meta.label_lower}:{scope}:version'
+
+
+def initial_version():
+    # после очистки кеша версия не должна совпасть с прежней,
+    # которую помнят индексы в памяти процессов
+    return time.time_ns() // 1000
+
+
+def get_versions(*specs):
+    """Версии нескольких моделей не больше чем одним обращением
+    к хранилищу.
+
+    specs — модели или пары (модель, scope). Версии моделей целиком
+    процесс помнит VERSION_CACHE_TTL секунд, поэтому ответ из кеша
+    обходится без запросов, а изменение из другого процесса становится
+    видно с этой задержкой. Версии со scope (данные одного
+    пользователя) читаются каждый раз: следующий запрос того же
+    пользователя может попасть в другой воркер.
+    """
+    keys = [
+        version_key(*spec) if isinstance(spec, tuple) else version_key(spec)
+        for spec in specs
+    ]
+    now = time.monotonic()
+    versions = {}
+    for key in keys:
+        version, expires = _local_versions.get(key, (None, 0))
+        if expires > now:
+            versions[key] = version
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        versions.update(_read_store(missing))
+        for key, spec in zip(keys, specs):
+            if key in missing and not isinstance(spec, tuple):
+                remember(key, versions[key])
+    return [versions[key] for key in keys]
+
+
+def remember(key, version):
+    if len(_local_versions) >= LOCAL_VERSIONS_SIZE:
+        _local_versions.clear()
+    _local_versions[key] = (
+        version, time.monotonic() + settings.VERSION_CACHE_TTL)
+
+
+def _read_store(keys):
+    if settings.VERSION_STORE == 'database':
+        return _read_database(keys)
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = cache.get_or_set(
+                key, initial_version, timeout=None)
+    return versions
+
+
+def get_version(model, scope=None):
+    return get_versions(model if scope is None else (model, scope))[0]
+
+
+def bump_version(model, scope=None):
+    key = version_key(model, scope)
+    if settings.VERSION_STORE == 'database':
+        if not CacheVersion.objects.filter(key=key).update(
+                version=F('version') + 1):
+            CacheVersion.objects.bulk_create(
+                [CacheVersion(key=key, version=initial_version())],
+                ignore_conflicts=True)
+        version = _read_database([key])[key]
+    else:
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            # ключа нет (кеш очищен или ещё не заполнен)
+            version = initial_version()
+            cache.set(key, version, timeout=None)
+    if scope is None:
+        # этот процесс видит своё изменение сразу
+        remember(key, version)
+    return version
+
+
+def _read_database(keys):
+    versions = dict(CacheVersion.objects.filter(
+        key__in=keys).values_list('key', 'version'))
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        CacheVersion.objects.bulk_create(
+            [CacheVersion(key=key, version=initial_version())
+             for key in missing],
+            ignore_conflicts=True,
+        )
+        # перечитываем: строку мог создать другой процесс
+        versions.update(CacheVersion.objects.filter(
+            key__in=missing).values_list('key', 'version'))
+    return versions
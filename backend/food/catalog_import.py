@@ -0,0 +1,283 @@
+# backend/food/catalog_import.py
+# Потоковый импорт справочников (продукты, теги) из JSON и CSV.
+# Файл читается по частям и пишется пачками, каждая пачка в своей
+# транзакции, так что память не растёт с размером файла.
+
+import csv
+import json
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+
+from food.cache import bump_version
+
+BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+# больше элемент JSON не бывает: битый файл не читается в память целиком
+MAX_ITEM_SIZE = 1024 * 1024
+# сколько ошибок хранить в отчёте, остальные только считаются
+MAX_REPORTED_ERRORS = 20
+
+# key — поля, по которым строка файла находит запись, остальные поля
+# обновляются; если на key есть ограничение уникальности, пишем upsert
+Catalog = namedtuple('Catalog', 'model fields key')
+Row = namedtuple('Row', 'position values')
+
+
+NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+
+def is_cut_number(item, buffer, end):
+    """Могло ли число оборваться на границе куска: за ним до конца
+    буфера только символы числа (4.5e3 читается и как 4, и как 4.5)."""
+    if isinstance(item, bool) or not isinstance(item, (int, float)):
+        return False
+    return all(char in NUMBER_CHARS for char in buffer[end:])
+
+
+def iter_json(file, chunk_size=READ_CHUNK_SIZE):
+    """Элементы JSON-массива верхнего уровня по одному.
+
+    В памяти одновременно только текущий элемент и кусок файла.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def skip(chars):
+        nonlocal buffer, position, eof
+        while True:
+            while position < len(buffer) and buffer[position] in chars:
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            buffer, position = '', 0
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+
+    skip(' \t\r\n')
+    if buffer[position:position + 1] != '[':
+        raise ValueError('ожидается JSON-массив')
+    position += 1
+    index = 0
+    while True:
+        skip(' \t\r\n')
+        if buffer[position:position + 1] == ']':
+            return
+        if index:
+            if buffer[position:position + 1] != ',':
+                raise ValueError(f'ожидается "," после элемента {index}')
+            position += 1
+            skip(' \t\r\n')
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof or len(buffer) - position > MAX_ITEM_SIZE:
+                    raise
+                item = end = None
+            if end is not None and (
+                    eof or not is_cut_number(item, buffer, end)):
+                break
+            if len(buffer) - position > MAX_ITEM_SIZE:
+                raise ValueError(f'элемент {index + 1} слишком большой')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+        position = end
+        index += 1
+        yield index, item
+
+
+def read_json(file, fields):
+    for index, item in iter_json(file):
+        if not isinstance(item, dict):
+            yield Row(index, None)
+            continue
+        yield Row(index, {field: item.get(field) for field in fields})
+
+
+def read_csv(file, fields):
+    """Строки CSV; заголовок необязателен, без него поля идут
+    в порядке fields (как в data/ingredients.csv)."""
+    reader = csv.reader(file)
+    columns = fields
+    for row in reader:
+        if reader.line_num == 1 and set(row) >= set(fields):
+            columns = row
+            continue
+        if not any(row):
+            continue
+        yield Row(reader.line_num, dict(zip(columns, row)))
+
+
+READERS = {'json': read_json, 'csv': read_csv}
+
+
+class Report:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = []
+
+    @property
+    def processed(self):
+        return self.inserted + self.updated + self.skipped + self.invalid
+
+    def error(self, position, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((position, message))
+
+
+def clean_row(catalog, row):
+    """Экземпляр модели из строки или ValidationError."""
+    if row.values is None:
+        raise ValidationError('ожидается объект')
+    values = {
+        field: '' if value is None else str(value).strip()
+        for field, value in row.values.items()
+    }
+    instance = catalog.model(**values)
+    instance.clean_fields()
+    return instance
+
+
+def key_of(catalog, instance):
+    return tuple(getattr(instance, field) for field in catalog.key)
+
+
+def is_unique_key(model, key):
+    """Есть ли в БД ограничение уникальности ровно по полям key."""
+    if len(key) == 1 and model._meta.get_field(key[0]).unique:
+        return True
+    return any(
+        isinstance(constraint, models.UniqueConstraint)
+        and constraint.condition is None
+        and set(constraint.fields) == set(key)
+        for constraint in model._meta.constraints
+    )
+
+
+def import_catalog(catalog, rows, batch_size=BATCH_SIZE, progress=None):
+    """Upsert строк rows в справочник пачками по batch_size.
+
+    Существующие записи с теми же значениями пропускаются, поэтому
+    в отчёте точные числа добавленных и обновлённых.
+    """
+    report = Report()
+    batch = {}
+    for row in rows:
+        try:
+            instance = clean_row(catalog, row)
+        except ValidationError as error:
+            report.error(row.position, '; '.join(
+                f'{field}: {" ".join(messages)}'
+                for field, messages in error.message_dict.items()
+            ) if hasattr(error, 'error_dict') else ' '.join(error.messages))
+            continue
+        key = key_of(catalog, instance)
+        if key in batch:
+            # повтор внутри пачки — побеждает последний
+            report.skipped += 1
+        batch[key] = instance
+        if len(batch) >= batch_size:
+            write_batch(catalog, batch, report)
+            batch = {}
+            if progress:
+                progress(report)
+    if batch:
+        write_batch(catalog, batch, report)
+    if progress:
+        progress(report)
+    if report.inserted or report.updated:
+        # bulk_create не посылает post_save, сбрасываем кеш сами
+        bump_version(catalog.model)
+    return report
+
+
+@transaction.atomic
+def write_batch(catalog, batch, report):
+    model = catalog.model
+    update_fields = [
+        field for field in catalog.fields if field not in catalog.key]
+    first, *_ = catalog.key
+    existing = {
+        key_of(catalog, instance): instance
+        for instance in model.objects.filter(**{
+            f'{first}__in': {getattr(item, first) for item in batch.values()}
+        })
+    }
+    inserted = updated = 0
+    changed = []
+    for key, instance in batch.items():
+        saved = existing.get(key)
+        if saved is None:
+            inserted += 1
+        elif any(getattr(saved, field) != getattr(instance, field)
+                 for field in update_fields):
+            updated += 1
+        else:
+            report.skipped += 1
+            continue
+        changed.append(instance)
+    if not changed:
+        return
+    try:
+        with transaction.atomic():
+            if is_unique_key(model, catalog.key):
+                # upsert, а не отдельные INSERT и UPDATE: запись,
+                # добавленная параллельно после выборки выше,
+                # не уронит пачку
+                model.objects.bulk_create(changed, **(
+                    {'update_conflicts': True,
+                     'unique_fields': catalog.key,
+                     'update_fields': update_fields}
+                    if update_fields else {'ignore_conflicts': True}
+                ))
+            else:
+                # upsert по key невозможен (продукт ищется по названию,
+                # а уникальна пара название и единица измерения):
+                # найденные записи обновляем по первичному ключу
+                for instance in changed:
+                    saved = existing.get(key_of(catalog, instance))
+                    if saved is not None:
+                        instance.pk = saved.pk
+                model.objects.bulk_create(
+                    [item for item in changed if item.pk is None])
+                model.objects.bulk_update(
+                    [item for item in changed if item.pk is not None],
+                    update_fields)
+    except IntegrityError:
+        # конфликт по другому уникальному полю (например, имя тега) —
+        # пишем пачку построчно, чтобы потерять только плохие строки
+        write_rows(catalog, changed, existing, update_fields, report)
+        return
+    report.inserted += inserted
+    report.updated += updated
+
+
+def write_rows(catalog, instances, existing, update_fields, report):
+    for instance in instances:
+        key = key_of(catalog, instance)
+        try:
+            with transaction.atomic():
+                if key in existing:
+                    catalog.model.objects.filter(
+                        **dict(zip(catalog.key, key))
+                    ).update(**{
+                        field: getattr(instance, field)
+                        for field in update_fields
+                    })
+                    report.updated += 1
+                else:
+                    instance.save(force_insert=True)
+                    report.inserted += 1
+        except IntegrityError as error:
+            report.error(', '.join(key), str(error))
@@ -11,3 +11,10 @@ USER_USERNAME_LENGTH = 150
 
 RECIPE_MIN_COOKING_TIME = 1  # in minutes
 INGREDIENT_MIN_AMOUNT = 1  # minimum amount of ingredient in a recipe
+
+# рейтинг популярности рецепта (команда refresh_popularity):
+# (вес избранного * избранное + вес корзины * корзины)
+#     / (возраст в часах + 2) ** POPULARITY_GRAVITY
+POPULARITY_FAVORITE_WEIGHT = 2
+POPULARITY_CART_WEIGHT = 1
+POPULARITY_GRAVITY = 1.5
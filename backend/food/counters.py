@@ -0,0 +1,47 @@
+# backend/food/counters.py
+# Денормализованные счётчики User и Recipe: атомарные приращения через F()
+# и полный пересчёт для исправления расхождений (команда recount).
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from food.models import Favorite, Follow, Recipe, ShoppingCartItem, User
+
+RELATION_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCartItem: 'carts_count',
+}
+
+
+def change_counter(model, pk, field, delta):
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, Value(0))})
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+COUNTERS = (
+    (User, 'recipes_count', count_subquery(Recipe, 'author')),
+    (User, 'followers_count', count_subquery(Follow, 'author')),
+    (User, 'following_count', count_subquery(Follow, 'follower')),
+    (Recipe, 'favorites_count', count_subquery(Favorite, 'recipe')),
+    (Recipe, 'carts_count', count_subquery(ShoppingCartItem, 'recipe')),
+)
+
+
+def recount():
+    """Пересчитать все счётчики, вернуть число исправленных строк."""
+    fixed = {}
+    for model, field, expression in COUNTERS:
+        fixed[f'{model.__name__}.{field}'] = model.objects.annotate(
+            actual=expression
+        ).filter(~Q(**{field: F('actual')})).update(**{field: expression})
+    return fixed
@@ -0,0 +1,46 @@
+# backend/food/feed.py
+# Лента рецептов авторов, на которых подписан пользователь.
+# Голова ленты (id самых новых рецептов) может храниться в кеше: первая
+# страница тогда выбирается по первичному ключу, без перебора авторов.
+# Голова сбрасывается сигналами (food.signals) при публикации и удалении
+# рецептов у авторов и при изменении подписок.
+
+from django.conf import settings
+from django.core.cache import cache
+
+from food.models import Follow, Recipe
+
+HEAD_SIZE = 101  # наибольший размер страницы + 1 для ссылки next
+
+
+def head_key(user_id):
+    return f'feed-head:{user_id}'
+
+
+def followed_recipes(recipes, user):
+    return recipes.filter(
+        author_id__in=Follow.objects.filter(
+            follower=user).values('author_id')
+    ).order_by('-id')
+
+
+def get_head(user):
+    """id самых новых рецептов ленты, при необходимости из кеша."""
+    ids = cache.get(head_key(user.pk))
+    if ids is None:
+        ids = list(followed_recipes(Recipe.objects, user).values_list(
+            'id', flat=True)[:HEAD_SIZE])
+        cache.set(head_key(user.pk), ids, settings.FEED_HEAD_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate(user_id):
+    cache.delete(head_key(user_id))
+
+
+def invalidate_followers(author_id):
+    cache.delete_many([
+        head_key(follower_id) for follower_id in
+        Follow.objects.filter(
+            author_id=author_id).values_list('follower_id', flat=True)
+    ])
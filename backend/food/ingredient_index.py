@@ -0,0 +1,68 @@
+# backend/food/ingredient_index.py
+# Индекс продуктов в памяти процесса для автодополнения в форме рецепта.
+# Строится при первом обращении и перестраивается, когда меняется
+# версия кеша Ingredient (см. food.cache и food.signals).
+
+import threading
+from bisect import bisect_left
+
+from food.cache import get_version
+from food.models import Ingredient
+
+
+def normalize(text):
+    return text.casefold().replace('ё', 'е').strip()
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = []
+        self._items = []
+
+    def _build(self, version):
+        rows = sorted(
+            (normalize(name), name, pk, unit)
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit')
+        )
+        self._keys = [row[0] for row in rows]
+        self._items = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, name, pk, unit in rows
+        ]
+        self._version = version
+
+    def _ensure_fresh(self, version=None):
+        if version is None:
+            version = get_version(Ingredient)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+
+    def search(self, query, limit=None, version=None):
+        """Сначала продукты, начинающиеся с query, затем содержащие его.
+
+        version — уже прочитанная версия Ingredient, чтобы не читать
+        её второй раз.
+        """
+        self._ensure_fresh(version)
+        keys, items = self._keys, self._items
+        query = normalize(query)
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        found = items[start:end]
+        if limit is not None and len(found) >= limit:
+            return found[:limit]
+        found += [
+            item for key, item in zip(keys, items)
+            if query in key and not key.startswith(query)
+        ]
+        return found if limit is None else found[:limit]
+
+
+ingredient_index = IngredientIndex()
@@ -1,40 +1,79 @@
 # запускать команды для загрузки данных можно так:
 # python manage.py load_ingredients_json ../data/ingredients.json
+# python manage.py load_ingredients_json ../data/ingredients.csv
 # python manage.py load_tags_json ../data/tags.json
+# повторный запуск безопасен: новые записи добавляются, изменённые
+# обновляются, совпадающие пропускаются
 
-import json
+import os
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from food.catalog_import import BATCH_SIZE, READERS, import_catalog
 
 
 class BaseLoadCommand(BaseCommand):
-    model = None  # установить в дочернем классе
+    catalog = None  # установить в дочернем классе
+    help = 'Импорт справочника из JSON- или CSV-файла'
 
     def add_arguments(self, parser):
         parser.add_argument(
             'file_path',
             type=str,
-            help='Путь к JSON-файлу'
+            help='Путь к JSON- или CSV-файлу'
         )
-
-    class Command(BaseCommand):
-        help = 'Импорт данных из JSON-файла'
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию по расширению'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
 
     def handle(self, *args, **options):
         file_path = options['file_path']
+        file_format = (
+            options['format']
+            or os.path.splitext(file_path)[1].lstrip('.').lower()
+        )
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла {file_path}, укажите --format')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size от 1')
+        self.started = time.monotonic()
+        self.show_progress = (
+            options['verbosity'] >= 2 or self.stdout.isatty())
         try:
-            with open(file_path, encoding='utf-8') as file:
-                created = self.model.objects.bulk_create(
-                    (self.model(**item) for item in json.load(file)),
-                    ignore_conflicts=True
-                )
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Добавлено {len(created)}'
-                        f' объектов из файла "{file_path}"'
-                    )
+            with open(file_path, encoding='utf-8-sig', newline='') as file:
+                report = import_catalog(
+                    self.catalog,
+                    READERS[file_format](file, self.catalog.fields),
+                    batch_size=options['batch_size'],
+                    progress=self.progress,
                 )
-        except Exception as e:
-            self.stderr.write(self.style.ERROR(
-                f'Ошибка при обработке файла {file_path}: {e}'
-            ))
+        except (OSError, ValueError) as error:
+            raise CommandError(
+                f'Ошибка при обработке файла {file_path}: {error}')
+        if self.show_progress and self.stdout.isatty():
+            self.stdout.write('')
+        for position, message in report.errors:
+            self.stderr.write(f'{position}: {message}')
+        if report.invalid > len(report.errors):
+            self.stderr.write(
+                f'... и ещё {report.invalid - len(report.errors)} ошибок')
+        self.stdout.write(self.style.SUCCESS(
+            f'Файл "{file_path}": добавлено {report.inserted}, '
+            f'обновлено {report.updated}, без изменений {report.skipped}, '
+            f'с ошибками {report.invalid}'
+        ))
+
+    def progress(self, report):
+        if not self.show_progress:
+            return
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'Обработано {report.processed} строк '
+            f'({report.processed / max(elapsed, 1e-6):.0f} строк/с)',
+            ending='\r' if self.stdout.isatty() else '\n',
+        )
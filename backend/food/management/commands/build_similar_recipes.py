@@ -0,0 +1,19 @@
+# сборка индекса похожих рецептов, запускается по cron:
+# 0 3 * * * python manage.py build_similar_recipes
+
+from django.core.management.base import BaseCommand
+
+from food.similar import build_index, index_path, save_index
+
+
+class Command(BaseCommand):
+    help = 'Сборка индекса похожих рецептов (/api/recipes/{id}/similar/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+
+    def handle(self, *args, **options):
+        index = build_index(options['top'])
+        save_index(index)
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс для {len(index)} рецептов записан в {index_path()}'))
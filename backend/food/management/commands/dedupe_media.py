@@ -0,0 +1,62 @@
+# перенос загруженных ранее изображений в хранилище с адресацией
+# по содержимому (food.storage): дубликаты сливаются в один файл
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from food.storage import (content_name, content_storage, file_digest,
+                          is_content_name)
+
+
+class Command(BaseCommand):
+    help = 'Перенос изображений в хранилище с адресацией по содержимому'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='только подсчитать, сколько места освободится')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        # старое имя -> новое, файлы считаются один раз
+        renamed = {}
+        sizes = {}
+        missing = 0
+        for model, field in content_storage.fields():
+            rows = model._default_manager.exclude(
+                **{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+            for pk, name in rows.values_list('pk', field.name).iterator():
+                if name not in renamed:
+                    if not content_storage.exists(name):
+                        missing += 1
+                        self.stderr.write(f'Нет файла {name}')
+                        continue
+                    sizes[name] = content_storage.size(name)
+                    with content_storage.open(name, 'rb') as source:
+                        digest = file_digest(File(source))
+                        if is_content_name(name, digest):
+                            new_name = name
+                        elif dry_run:
+                            new_name = content_name(name, digest)
+                        else:
+                            new_name = content_storage.save(
+                                name, File(source))
+                    renamed[name] = new_name
+                if not dry_run and renamed[name] != name:
+                    model._default_manager.filter(pk=pk).update(
+                        **{field.name: renamed[name]})
+
+        old_size = sum(sizes.values())
+        new_size = sum(
+            {renamed[name]: sizes[name] for name in renamed}.values())
+        if not dry_run:
+            for name, new_name in renamed.items():
+                if name != new_name:
+                    # delete сам проверит, что ссылок не осталось
+                    content_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {len(renamed)} -> {len(set(renamed.values()))}, '
+            f'освобождено {(old_size - new_size) / 2 ** 20:.1f} МБ'
+            + (f', не найдено файлов: {missing}' if missing else '')
+            + (' (пробный запуск)' if dry_run else '')
+        ))
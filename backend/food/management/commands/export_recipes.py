@@ -0,0 +1,36 @@
+# выгрузка рецептов для переноса в другое окружение:
+# python manage.py export_recipes recipes.jsonl
+# изображения копируются в recipes.jsonl.images/ (или --images)
+
+from django.core.management.base import BaseCommand, CommandError
+
+from food.recipe_transfer import export_recipes, images_path
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов в JSON Lines с каталогом изображений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_path', type=str)
+        parser.add_argument(
+            '--images', help='Каталог изображений, по умолчанию '
+                             '<file_path>.images')
+
+    def handle(self, *args, **options):
+        file_path = options['file_path']
+        images_dir = options['images'] or images_path(file_path)
+        try:
+            with open(file_path, 'w', encoding='utf-8') as file:
+                report = export_recipes(
+                    file, images_dir, progress=self.progress)
+        except OSError as error:
+            raise CommandError(f'Ошибка записи {file_path}: {error}')
+        for recipe_id, message in report.errors:
+            self.stderr.write(f'рецепт {recipe_id}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено {report.inserted} рецептов в "{file_path}", '
+            f'изображения в "{images_dir}", с ошибками {report.invalid}'))
+
+    def progress(self, report):
+        if self.stdout.isatty():
+            self.stdout.write(f'Выгружено {report.inserted}', ending='\r')
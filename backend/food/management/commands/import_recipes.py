@@ -0,0 +1,60 @@
+# загрузка рецептов, выгруженных export_recipes:
+# python manage.py import_recipes recipes.jsonl
+# пользователи, теги и продукты должны уже быть в базе (load_*_json);
+# после загрузки стоит запустить make_thumbnails и refresh_popularity
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from food.recipe_transfer import BATCH_SIZE, RecipeImporter, images_path
+
+
+class Command(BaseCommand):
+    help = 'Загрузка рецептов из JSON Lines пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_path', type=str)
+        parser.add_argument(
+            '--images', help='Каталог изображений, по умолчанию '
+                             '<file_path>.images')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                'БД не возвращает id из bulk_create, загрузка невозможна')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size от 1')
+        file_path = options['file_path']
+        importer = RecipeImporter(
+            options['images'] or images_path(file_path),
+            batch_size=options['batch_size'],
+        )
+        self.started = time.monotonic()
+        try:
+            with open(file_path, encoding='utf-8') as file:
+                report = importer.run(file, progress=self.progress)
+        except OSError as error:
+            raise CommandError(f'Ошибка чтения {file_path}: {error}')
+        if self.stdout.isatty():
+            self.stdout.write('')
+        for line_number, message in report.errors:
+            self.stderr.write(f'{line_number}: {message}')
+        if report.invalid > len(report.errors):
+            self.stderr.write(
+                f'... и ещё {report.invalid - len(report.errors)} ошибок')
+        self.stdout.write(self.style.SUCCESS(
+            f'Файл "{file_path}": добавлено {report.inserted}, '
+            f'уже были {report.skipped}, с ошибками {report.invalid}'))
+
+    def progress(self, report):
+        if not self.stdout.isatty():
+            return
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'Обработано {report.processed} рецептов '
+            f'({report.processed / max(elapsed, 1e-6):.0f} в секунду)',
+            ending='\r',
+        )
@@ -1,7 +1,10 @@
+from food.catalog_import import Catalog
 from food.models import Ingredient
 
 from .base_load_command import BaseLoadCommand
 
 
 class Command(BaseLoadCommand):
-    model = Ingredient
+    # ключ — название: файл с исправленной единицей измерения
+    # обновляет продукт, а не добавляет второй с тем же названием
+    catalog = Catalog(Ingredient, ('name', 'measurement_unit'), ('name',))
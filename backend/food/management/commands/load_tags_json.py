@@ -1,7 +1,9 @@
+from food.catalog_import import Catalog
 from food.models import Tag
 
 from .base_load_command import BaseLoadCommand
 
 
 class Command(BaseLoadCommand):
-    model = Tag
+    # ключ — слаг, название обновляется
+    catalog = Catalog(Tag, ('name', 'slug'), ('slug',))
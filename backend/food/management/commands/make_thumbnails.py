@@ -0,0 +1,58 @@
+# сборка миниатюр для изображений, загруженных до их появления
+# или с ошибкой, и удаление миниатюр, на которые никто не ссылается
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from food import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Сборка недостающих миниатюр изображений рецептов и аватаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='пересобрать миниатюры всех изображений')
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='удалить миниатюры, на которые никто не ссылается')
+
+    def handle(self, *args, **options):
+        for kind, (model, field, hash_field) in thumbnails.SOURCES.items():
+            objects = model.objects.exclude(**{field: ''}).exclude(
+                **{f'{field}__isnull': True})
+            if not options['all']:
+                objects = objects.filter(**{hash_field: ''})
+            done = failed = 0
+            for pk, name in objects.values_list('pk', field).iterator():
+                try:
+                    thumbnails.process(kind, pk, name)
+                    done += 1
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{kind}: собрано {done}, ошибок {failed}'))
+        if options['prune']:
+            self.prune()
+
+    def prune(self):
+        used = {
+            name
+            for kind, (model, _, hash_field) in thumbnails.SOURCES.items()
+            for digest in model.objects.exclude(
+                **{hash_field: ''}).values_list(hash_field, flat=True)
+            for name in thumbnails.variant_names(digest, kind)
+        }
+        removed = 0
+        if default_storage.exists(thumbnails.DIRECTORY):
+            directories, _ = default_storage.listdir(thumbnails.DIRECTORY)
+            for directory in directories:
+                path = f'{thumbnails.DIRECTORY}/{directory}'
+                for file_name in default_storage.listdir(path)[1]:
+                    if f'{path}/{file_name}' not in used:
+                        default_storage.delete(f'{path}/{file_name}')
+                        removed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено неиспользуемых миниатюр: {removed}'))
@@ -0,0 +1,33 @@
+# пересборка и проверка итогов корзин (ShoppingCartTotal):
+# python manage.py rebuild_cart_totals           - пересобрать
+# python manage.py rebuild_cart_totals --check   - только сверить
+
+from django.core.management.base import BaseCommand, CommandError
+
+from food import shopping_cart
+
+
+class Command(BaseCommand):
+    help = 'Пересборка итогов корзин покупок и сверка с живым подсчётом'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить таблицу, ничего не меняя'
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            shopping_cart.rebuild()
+            self.stdout.write('Итоги корзин пересобраны')
+
+        mismatches = shopping_cart.find_mismatches()
+        for (user_id, ingredient_id), (stored, live) in mismatches.items():
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'в таблице {stored}, по корзине {live}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Итоги корзин совпадают'))
@@ -0,0 +1,15 @@
+# пересчёт денормализованных счётчиков пользователей и рецептов:
+# python manage.py recount
+
+from django.core.management.base import BaseCommand
+
+from food.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков рецептов, подписок, избранного и корзин'
+
+    def handle(self, *args, **options):
+        for counter, fixed in recount().items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
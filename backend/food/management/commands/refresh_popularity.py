@@ -0,0 +1,18 @@
+# пересчёт рейтинга популярности рецептов, запускается по cron:
+# */15 * * * * python manage.py refresh_popularity
+
+from django.core.management.base import BaseCommand
+
+from food.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт рейтинга популярности рецептов (?ordering=popular)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = refresh_popularity(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинг обновлён у {updated} рецептов'))
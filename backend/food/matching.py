@@ -0,0 +1,191 @@
+# backend/food/matching.py
+# Подбор рецептов по имеющимся продуктам (POST /api/recipes/match/).
+# Инвертированный индекс продукт -> номера строк рецептов в массивах numpy
+# живёт в памяти процесса. Процесс, изменивший рецепт, правит индекс
+# на месте, остальные перестраивают его, увидев новую версию в кеше.
+
+import threading
+from collections import ChainMap, namedtuple
+
+import numpy as np
+from django.db import transaction
+
+from food.cache import bump_version, get_version
+from food.models import RecipeIngredient
+
+# сколько правок копится поверх словарей снимка, прежде чем
+# слиться с ними в новые словари
+COMPACT_SIZE = 1024
+
+# снимок индекса не меняется после сборки: правка собирает новый
+# и подменяет ссылку под блокировкой, так что match без блокировки
+# всегда видит согласованные массивы и словари
+MatchIndex = namedtuple('MatchIndex', (
+    'version',
+    'count',  # занятых строк в recipe_ids и sizes
+    'built',  # строк при сборке, от него считается, когда пересобрать
+    'rows',  # recipe_id -> номер строки
+    'recipe_ids',
+    'sizes',  # продуктов в рецепте
+    'ingredients',  # recipe_id -> кортеж id продуктов
+    'postings',  # ingredient_id -> np.array номеров строк
+))
+
+
+def overlay(mapping, changes):
+    """Словарь mapping с правками changes без копирования mapping:
+    правки лежат отдельным словарём поверх и сливаются с ним,
+    когда их больше COMPACT_SIZE."""
+    if isinstance(mapping, ChainMap):
+        top, base = mapping.maps
+    else:
+        top, base = {}, mapping
+    top = {**top, **changes}
+    if len(top) > COMPACT_SIZE:
+        return {**base, **top}
+    return ChainMap(top, base)
+
+
+class RecipeMatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+
+    def _build(self, version):
+        recipes = {}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id').iterator(chunk_size=10000):
+            recipes.setdefault(recipe_id, []).append(ingredient_id)
+        postings = {}
+        for row, ingredients in enumerate(recipes.values()):
+            for ingredient_id in ingredients:
+                postings.setdefault(ingredient_id, []).append(row)
+        return MatchIndex(
+            version=version,
+            count=len(recipes),
+            built=len(recipes),
+            rows={recipe_id: row for row, recipe_id in enumerate(recipes)},
+            recipe_ids=np.fromiter(
+                recipes, dtype=np.int64, count=len(recipes)),
+            sizes=np.fromiter(
+                (len(ingredients) for ingredients in recipes.values()),
+                dtype=np.int32, count=len(recipes)),
+            ingredients={
+                recipe_id: tuple(ingredients)
+                for recipe_id, ingredients in recipes.items()
+            },
+            postings={
+                ingredient_id: np.array(rows, dtype=np.int32)
+                for ingredient_id, rows in postings.items()
+            },
+        )
+
+    def _fresh_index(self):
+        version = get_version(RecipeIngredient)
+        index = self._index
+        if index is None or index.version != version:
+            with self._lock:
+                index = self._index
+                if index is None or index.version != version:
+                    index = self._index = self._build(version)
+        return index
+
+    @staticmethod
+    def _patch(index, version, recipe_id, ingredients):
+        """Новый снимок с изменённым составом рецепта; index
+        не меняется, его могут читать параллельные запросы.
+
+        Копируются только списки строк затронутых продуктов. Строки
+        в recipe_ids и sizes не переписываются: рецепт получает новую
+        строку в конце массивов, старая остаётся без продуктов.
+        """
+        recipe_ids, sizes, count = index.recipe_ids, index.sizes, index.count
+        row = index.rows.get(recipe_id)
+        postings = {
+            ingredient_id: index.postings[ingredient_id][
+                index.postings[ingredient_id] != row]
+            for ingredient_id in index.ingredients.get(recipe_id, ())
+        }
+        rows = {}
+        if ingredients:
+            if count == len(recipe_ids):
+                # место за count не видно старым снимкам, поэтому
+                # массивы растут удвоением, а не копией на каждую правку
+                capacity = max(2 * count, 16)
+                recipe_ids = np.resize(recipe_ids, capacity)
+                sizes = np.resize(sizes, capacity)
+            rows[recipe_id] = count
+            recipe_ids[count] = recipe_id
+            sizes[count] = len(ingredients)
+            for ingredient_id in ingredients:
+                postings[ingredient_id] = np.append(
+                    postings.get(
+                        ingredient_id,
+                        index.postings.get(ingredient_id, [])),
+                    count,
+                ).astype(np.int32)
+            count += 1
+        return MatchIndex(
+            version, count, index.built, overlay(index.rows, rows),
+            recipe_ids, sizes,
+            overlay(index.ingredients, {recipe_id: ingredients}),
+            overlay(index.postings, postings))
+
+    def recipe_changed(self, recipe_id):
+        version = bump_version(RecipeIngredient)
+        with self._lock:
+            index = self._index
+            if index is None or version != index.version + 1:
+                # индекс не строился или отстал — перестроится при запросе
+                return
+            if index.count >= 2 * index.built + COMPACT_SIZE:
+                # строк, оставленных правками, стало больше живых
+                self._index = None
+                return
+            self._index = self._patch(index, version, recipe_id, tuple(
+                RecipeIngredient.objects.filter(
+                    recipe_id=recipe_id).values_list(
+                    'ingredient_id', flat=True)))
+
+    def match(self, ingredient_ids, limit):
+        """Рецепты по убыванию доли имеющихся продуктов.
+
+        Возвращает список (recipe_id, доля, id недостающих продуктов).
+        """
+        index = self._fresh_index()
+        ingredient_ids = set(ingredient_ids)
+        postings = [
+            index.postings[ingredient_id]
+            for ingredient_id in ingredient_ids
+            if ingredient_id in index.postings
+        ]
+        if not postings:
+            return []
+        have = np.bincount(np.concatenate(postings), minlength=index.count)
+        rows = np.flatnonzero(have)
+        coverage = have[rows] / index.sizes[rows]
+        # сначала полнее покрытые, затем с большим числом совпадений,
+        # затем новые
+        order = np.lexsort((
+            -index.recipe_ids[rows], -have[rows], -coverage))[:limit]
+        return [
+            (
+                int(recipe_id),
+                float(share),
+                [
+                    ingredient_id
+                    for ingredient_id in index.ingredients[int(recipe_id)]
+                    if ingredient_id not in ingredient_ids
+                ],
+            )
+            for recipe_id, share in zip(
+                index.recipe_ids[rows[order]], coverage[order])
+        ]
+
+
+recipe_matcher = RecipeMatcher()
+
+
+def recipe_changed(recipe_id):
+    """Отметить изменение состава рецепта после фиксации транзакции."""
+    transaction.on_commit(lambda: recipe_matcher.recipe_changed(recipe_id))
@@ -0,0 +1,101 @@
+# Полнотекстовый поиск рецептов (см. food/search.py).
+# PostgreSQL: pg_trgm и GIN-индексы по tsvector и по UPPER(name),
+# SQLite: виртуальная таблица FTS5, синхронизируемая триггерами.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import food.models
+
+POSTGRESQL_FORWARD = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX IF NOT EXISTS food_recipe_search_gin ON food_recipe "
+    "USING gin (to_tsvector('russian'::regconfig, "
+    "COALESCE(name, '') || ' ' || COALESCE(text, '')))",
+    'CREATE INDEX IF NOT EXISTS food_recipe_name_trgm ON food_recipe '
+    'USING gin (UPPER(name) gin_trgm_ops)',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS food_recipe_name_trgm',
+    'DROP INDEX IF EXISTS food_recipe_search_gin',
+)
+
+
+def sqlite_values(row):
+    # ё не считается диакритикой в unicode61, поэтому приводим её к е сами;
+    # таблица FTS без содержимого (content=''), в ней только индекс
+    return ', '.join(
+        f"replace(replace({row}.{column}, 'ё', 'е'), 'Ё', 'Е')"
+        for column in ('name', 'text')
+    )
+
+
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS food_recipe_fts USING fts5("
+    "name, text, content='', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER IF NOT EXISTS food_recipe_fts_insert '
+    'AFTER INSERT ON food_recipe BEGIN '
+    'INSERT INTO food_recipe_fts(rowid, name, text) '
+    f"VALUES (new.id, {sqlite_values('new')}); END",
+    'CREATE TRIGGER IF NOT EXISTS food_recipe_fts_delete '
+    'AFTER DELETE ON food_recipe BEGIN '
+    "INSERT INTO food_recipe_fts(food_recipe_fts, rowid, name, text) "
+    f"VALUES ('delete', old.id, {sqlite_values('old')}); END",
+    'CREATE TRIGGER IF NOT EXISTS food_recipe_fts_update '
+    'AFTER UPDATE OF name, text ON food_recipe BEGIN '
+    "INSERT INTO food_recipe_fts(food_recipe_fts, rowid, name, text) "
+    f"VALUES ('delete', old.id, {sqlite_values('old')}); "
+    'INSERT INTO food_recipe_fts(rowid, name, text) '
+    f"VALUES (new.id, {sqlite_values('new')}); END",
+    'INSERT INTO food_recipe_fts(rowid, name, text) '
+    f"SELECT id, {sqlite_values('food_recipe')} FROM food_recipe",
+    # название весит больше описания
+    "INSERT INTO food_recipe_fts(food_recipe_fts, rank) "
+    "VALUES ('rank', 'bm25(10.0, 1.0)')",
+)
+SQLITE_BACKWARD = (
+    'DROP TRIGGER IF EXISTS food_recipe_fts_update',
+    'DROP TRIGGER IF EXISTS food_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS food_recipe_fts_insert',
+    'DROP TABLE IF EXISTS food_recipe_fts',
+)
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0004_alter_tag_options_alter_follow_author_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchEntry',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='food.recipe')),
+                ('document', food.models.FullTextField(db_column='food_recipe_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'food_recipe_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor({
+                'postgresql': POSTGRESQL_FORWARD,
+                'sqlite': SQLITE_FORWARD,
+            }),
+            run_for_vendor({
+                'postgresql': POSTGRESQL_BACKWARD,
+                'sqlite': SQLITE_BACKWARD,
+            }),
+        ),
+    ]
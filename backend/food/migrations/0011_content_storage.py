@@ -0,0 +1,24 @@
+# Generated by Django 4.2.23 on 2026-10-18 03:58
+
+from django.db import migrations, models
+import food.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0010_image_hashes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(help_text='Загрузите изображение рецепта', storage=food.storage.get_content_storage, upload_to='recipes/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=food.storage.get_content_storage, upload_to='avatars/', verbose_name='Аватар'),
+        ),
+    ]
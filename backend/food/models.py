@@ -1,8 +1,10 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.db.models import Lookup
 
 from food import constants as const
+from food.storage import get_content_storage
 
 username_validator = RegexValidator(
     regex=r'^[\w.@-]+$',
@@ -33,10 +35,36 @@ class User(AbstractUser):
     )
     avatar = models.ImageField(
         upload_to='avatars/',
+        storage=get_content_storage,
         null=True,
         blank=True,
         verbose_name='Аватар',
     )
+    # sha256 аватара, по нему строятся адреса миниатюр (food.thumbnails);
+    # пустой, пока миниатюры не готовы
+    avatar_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name='Хеш аватара',
+    )
+    # счётчики обновляются в api.views через food.counters,
+    # расхождения исправляет команда recount
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписок',
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -73,6 +101,13 @@ class Follow(models.Model):
                 name='unique_author_follower'
             )
         ]
+        indexes = [
+            # подписки пользователя: UserWithSubscriptionViewSet.subscriptions
+            models.Index(
+                fields=['follower', 'author'],
+                name='follow_follower_author_idx'
+            ),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
@@ -141,9 +176,17 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/',
+        storage=get_content_storage,
         verbose_name='Изображение',
         help_text='Загрузите изображение рецепта'
     )
+    # см. User.avatar_hash
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name='Хеш изображения',
+    )
     cooking_time = models.PositiveIntegerField(
         validators=[MinValueValidator(const.RECIPE_MIN_COOKING_TIME)],
         verbose_name='Время (мин)'
@@ -156,12 +199,50 @@ class Recipe(models.Model):
         through='RecipeIngredient',
         related_name='recipes'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата публикации',
+    )
+    # метка для ETag ответа /api/recipes/{id}/,
+    # обновляется при каждом сохранении рецепта
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    # пересчитывается командой refresh_popularity
+    popularity = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность',
+    )
 
     class Meta:
         default_related_name = 'recipes'
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-id']
+        indexes = [
+            # фильтр ?author= с сортировкой по умолчанию
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_author_id_idx'
+            ),
+            # ?ordering=popular
+            models.Index(
+                fields=['-popularity', '-id'],
+                name='recipe_popularity_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -218,6 +299,14 @@ class UserRecipeRelationBase(models.Model):
                 name='%(class)s_unique_user_recipe'
             )
         ]
+        # (user, recipe) покрыт ограничением уникальности,
+        # обратное направление — выборки по рецепту
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='%(class)s_recipe_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe}'
@@ -233,3 +322,95 @@ class ShoppingCartItem(UserRecipeRelationBase):
     class Meta(UserRecipeRelationBase.Meta):
         verbose_name = 'Элемент корзины'
         verbose_name_plural = 'Корзина покупок'
+
+
+class ShoppingCartTotal(models.Model):
+    """Сумма продукта по всем рецептам в корзине пользователя.
+
+    Поддерживается food.shopping_cart при изменении корзины и рецептов,
+    пересобирается командой rebuild_cart_totals.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_totals',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_totals',
+        verbose_name='Продукт',
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Итог корзины'
+        verbose_name_plural = 'Итоги корзин'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_cart_total'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} — {self.amount}'
+
+
+class CacheVersion(models.Model):
+    """Версия кеша модели (food.cache), общая для всех процессов.
+
+    Используется, когда общего кеша (Redis) нет, см. VERSION_STORE.
+    """
+    key = models.CharField(
+        max_length=200,
+        primary_key=True,
+        verbose_name='Ключ',
+    )
+    version = models.BigIntegerField(
+        verbose_name='Версия',
+    )
+
+    class Meta:
+        verbose_name = 'Версия кеша'
+        verbose_name_plural = 'Версии кеша'
+
+    def __str__(self):
+        return f'{self.key} = {self.version}'
+
+
+class FullTextField(models.TextField):
+    """Скрытый столбец таблицы FTS5, по нему выполняется MATCH."""
+
+
+@FullTextField.register_lookup
+class FullTextMatch(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class RecipeSearchEntry(models.Model):
+    """Таблица FTS5 для поиска рецептов в SQLite.
+
+    Создаётся миграцией 0005_recipe_search, в PostgreSQL не используется.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search_entry',
+    )
+    document = FullTextField(db_column='food_recipe_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'food_recipe_fts'
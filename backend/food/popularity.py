@@ -0,0 +1,48 @@
+# backend/food/popularity.py
+# Рейтинг популярности рецептов для ?ordering=popular. Считается пакетно
+# по счётчикам избранного и корзин (см. food.counters), затухает с
+# возрастом рецепта.
+
+from django.utils.timezone import now
+
+from food import constants as const
+from food.cache import bump_version
+from food.models import Recipe
+
+
+def popularity(favorites_count, carts_count, age_hours):
+    return (
+        const.POPULARITY_FAVORITE_WEIGHT * favorites_count
+        + const.POPULARITY_CART_WEIGHT * carts_count
+    ) / (age_hours + 2) ** const.POPULARITY_GRAVITY
+
+
+def refresh_popularity(batch_size=1000):
+    """Пересчитать рейтинг всех рецептов, вернуть число изменённых."""
+    moment = now()
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Recipe.objects.filter(id__gt=last_id).order_by('id').only(
+                'id', 'favorites_count', 'carts_count', 'created',
+                'popularity',
+            )[:batch_size]
+        )
+        if not batch:
+            if updated:
+                # порядок ?ordering=popular изменился (ETag списка)
+                bump_version(Recipe)
+            return updated
+        last_id = batch[-1].id
+        changed = []
+        for recipe in batch:
+            score = popularity(
+                recipe.favorites_count,
+                recipe.carts_count,
+                (moment - recipe.created).total_seconds() / 3600,
+            )
+            if score != recipe.popularity:
+                recipe.popularity = score
+                changed.append(recipe)
+        updated += Recipe.objects.bulk_update(changed, ['popularity'])
@@ -0,0 +1,264 @@
+# backend/food/recipe_transfer.py
+# Перенос рецептов между окружениями (команды export_recipes и
+# import_recipes). Формат — JSON Lines, рецепт на строку; автор, теги
+# и продукты указаны естественными ключами (логин, слаг, название
+# и единица измерения). Изображения лежат в соседнем каталоге под именами
+# <sha256><расширение>, одинаковые картинки выгружаются один раз.
+
+import json
+import os
+import re
+import shutil
+from collections import Counter, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_datetime
+
+from food import feed
+from food.cache import bump_version
+from food.catalog_import import Report
+from food.constants import INGREDIENT_MIN_AMOUNT
+from food.counters import change_counter
+from food.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+from food.storage import content_name, file_digest
+
+BATCH_SIZE = 1000
+IMAGE_NAME_RE = re.compile(r'^[0-9a-f]{64}\.[0-9a-z]+$')
+
+ImportedRecipe = namedtuple('ImportedRecipe', 'recipe created tags amounts')
+
+
+def images_path(path):
+    """Каталог изображений по умолчанию: рядом с файлом рецептов."""
+    return f'{path}.images'
+
+
+def export_image(image, images_dir):
+    """Скопировать изображение в images_dir, вернуть имя копии."""
+    stem, extension = os.path.splitext(os.path.basename(image.name))
+    if IMAGE_NAME_RE.match(f'{stem}.x'):
+        # файл из хранилища с адресацией по содержимому
+        digest = stem
+    else:
+        with image.storage.open(image.name, 'rb') as source:
+            digest = file_digest(source)
+    name = f'{digest}{extension.lower()}'
+    path = os.path.join(images_dir, name)
+    if not os.path.exists(path):
+        temporary = f'{path}.tmp'
+        with image.storage.open(image.name, 'rb') as source, \
+                open(temporary, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        os.replace(temporary, path)
+    return name
+
+
+def export_recipes(file, images_dir, progress=None):
+    os.makedirs(images_dir, exist_ok=True)
+    recipes = Recipe.objects.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'ingredients_in_recipe',
+            queryset=RecipeIngredient.objects.select_related(
+                'ingredient').order_by('id'),
+        ),
+    ).order_by('id')
+    report = Report()
+    for recipe in recipes.iterator(chunk_size=BATCH_SIZE):
+        try:
+            image = export_image(recipe.image, images_dir)
+        except OSError as error:
+            report.error(recipe.id, f'изображение {recipe.image}: {error}')
+            continue
+        file.write(json.dumps({
+            'id': recipe.id,
+            'author': recipe.author.username,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'created': recipe.created.isoformat(),
+            'image': image,
+            'tags': sorted(tag.slug for tag in recipe.tags.all()),
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.ingredients_in_recipe.all()
+            ],
+        }, ensure_ascii=False) + '\n')
+        report.inserted += 1
+        if progress and report.inserted % BATCH_SIZE == 0:
+            progress(report)
+    return report
+
+
+class RecipeImporter:
+    """Загрузка рецептов пачками через bulk_create.
+
+    Авторы, теги и продукты ищутся по словарям, прочитанным один раз,
+    рецепт с тем же автором и названием считается уже загруженным.
+    """
+
+    def __init__(self, images_dir, batch_size=BATCH_SIZE):
+        self.images_dir = images_dir
+        self.batch_size = batch_size
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit')
+        }
+        self.images = {}  # имя в каталоге -> имя в хранилище
+        self.changed_authors = set()
+        self.storage = Recipe._meta.get_field('image').storage
+        self.upload_to = Recipe._meta.get_field('image').upload_to
+
+    def run(self, file, progress=None):
+        report = Report()
+        batch = {}
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                item = self.parse(json.loads(line))
+            except (ValueError, TypeError, ValidationError) as error:
+                report.error(line_number, '; '.join(
+                    error.messages if isinstance(error, ValidationError)
+                    else [str(error)]))
+                continue
+            key = (item.recipe.author_id, item.recipe.name)
+            if key in batch:
+                report.skipped += 1
+            batch[key] = item
+            if len(batch) >= self.batch_size:
+                self.write(batch, report)
+                batch = {}
+                if progress:
+                    progress(report)
+        if batch:
+            self.write(batch, report)
+        if progress:
+            progress(report)
+        if report.inserted:
+            self.finish()
+        return report
+
+    def parse(self, data):
+        if not isinstance(data, dict):
+            raise ValidationError('ожидается объект')
+        author_id = self.authors.get(data.get('author'))
+        if author_id is None:
+            raise ValidationError(
+                f'нет пользователя {data.get("author")!r}')
+        tags = []
+        for slug in data.get('tags') or ():
+            if slug not in self.tags:
+                raise ValidationError(f'нет тега {slug!r}')
+            tags.append(self.tags[slug])
+        amounts = {}
+        for item in data.get('ingredients') or ():
+            if not isinstance(item, dict):
+                raise ValidationError('продукт должен быть объектом')
+            key = (item.get('name'), item.get('measurement_unit'))
+            if key not in self.ingredients:
+                raise ValidationError(
+                    f'нет продукта {key[0]!r} ({key[1]!r})')
+            amount = item.get('amount')
+            if not isinstance(amount, int) or amount < INGREDIENT_MIN_AMOUNT:
+                raise ValidationError(f'неверная мера продукта {key[0]}')
+            amounts[self.ingredients[key]] = amount
+        if not amounts:
+            raise ValidationError('нет продуктов')
+        created = data.get('created')
+        if created is not None:
+            created = parse_datetime(created)
+            if created is None:
+                raise ValidationError('неверная дата публикации')
+        recipe = Recipe(
+            author_id=author_id,
+            name=data.get('name') or '',
+            text=data.get('text') or '',
+            cooking_time=data.get('cooking_time'),
+        )
+        # автор уже проверен по словарю, без запроса к БД
+        recipe.clean_fields(exclude=['author', 'image'])
+        RecipeIngredient(amount=max(amounts.values())).clean_fields(
+            exclude=['recipe', 'ingredient'])
+        recipe.image = self.store_image(data.get('image'))
+        return ImportedRecipe(recipe, created, set(tags), amounts)
+
+    def store_image(self, image):
+        """Положить изображение из каталога в хранилище, вернуть имя."""
+        # имя из файла используется в пути, поэтому только hex и расширение
+        if not isinstance(image, str) or not IMAGE_NAME_RE.match(image):
+            raise ValidationError(f'неверное имя изображения {image!r}')
+        if image in self.images:
+            return self.images[image]
+        digest = os.path.splitext(image)[0]
+        name = content_name(f'{self.upload_to}{image}', digest)
+        if not self.storage.exists(name):
+            try:
+                with open(os.path.join(self.images_dir, image), 'rb') as f:
+                    # проверяем до записи: недавно сохранённый файл
+                    # хранилище не удалит
+                    if file_digest(File(f)) != digest:
+                        raise ValidationError(
+                            f'изображение {image} повреждено')
+                    self.storage.save(f'{self.upload_to}{image}', File(f))
+            except OSError as error:
+                raise ValidationError(f'изображение {image}: {error}')
+        self.images[image] = name
+        return name
+
+    @transaction.atomic
+    def write(self, batch, report):
+        existing = set(Recipe.objects.filter(
+            author_id__in={author_id for author_id, _ in batch},
+            name__in={name for _, name in batch},
+        ).values_list('author_id', 'name'))
+        items = [item for key, item in batch.items() if key not in existing]
+        report.skipped += len(batch) - len(items)
+        if not items:
+            return
+        # id новых рецептов возвращают PostgreSQL и SQLite 3.35+
+        Recipe.objects.bulk_create([item.recipe for item in items])
+        # created заполняется auto_now_add, дату из файла ставим отдельно
+        dated = []
+        for item in items:
+            if item.created:
+                item.recipe.created = item.created
+                dated.append(item.recipe)
+        Recipe.objects.bulk_update(dated, ['created'])
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=item.recipe.id, tag_id=tag_id)
+            for item in items
+            for tag_id in item.tags
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=item.recipe.id,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for item in items
+            for ingredient_id, amount in item.amounts.items()
+        )
+        for author_id, count in Counter(
+                item.recipe.author_id for item in items).items():
+            change_counter(User, author_id, 'recipes_count', count)
+            self.changed_authors.add(author_id)
+        report.inserted += len(items)
+
+    def finish(self):
+        # bulk_create не посылает сигналов: сбрасываем ленты подписчиков
+        # и версии кеша (списки, индекс подбора, счётчики авторов)
+        for author_id in self.changed_authors:
+            feed.invalidate_followers(author_id)
+        for model in (Recipe, RecipeIngredient, User):
+            bump_version(model)
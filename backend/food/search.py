@@ -0,0 +1,121 @@
+# backend/food/search.py
+# Поиск рецептов по названию и описанию с ранжированием.
+# Индексы создаются миграцией 0005_recipe_search.
+
+import re
+
+from django.db import connection, connections
+from django.db.models import F, Q
+
+SEARCH_CONFIG = 'russian'
+WORD_RE = re.compile(r'\w+')
+
+
+def sqlite_values(row):
+    return ', '.join(
+        f"replace(replace({row}.{column}, 'ё', 'е'), 'Ё', 'Е')"
+        for column in ('name', 'text')
+    )
+
+
+# те же триггеры, что в миграции 0005: SQLite теряет их, когда миграция
+# пересоздаёт таблицу food_recipe (ALTER TABLE через копию таблицы)
+SQLITE_TRIGGERS = {
+    'food_recipe_fts_insert': (
+        'AFTER INSERT ON food_recipe BEGIN '
+        'INSERT INTO food_recipe_fts(rowid, name, text) '
+        f"VALUES (new.id, {sqlite_values('new')}); END"
+    ),
+    'food_recipe_fts_delete': (
+        'AFTER DELETE ON food_recipe BEGIN '
+        'INSERT INTO food_recipe_fts(food_recipe_fts, rowid, name, text) '
+        f"VALUES ('delete', old.id, {sqlite_values('old')}); END"
+    ),
+    'food_recipe_fts_update': (
+        'AFTER UPDATE OF name, text ON food_recipe BEGIN '
+        'INSERT INTO food_recipe_fts(food_recipe_fts, rowid, name, text) '
+        f"VALUES ('delete', old.id, {sqlite_values('old')}); "
+        'INSERT INTO food_recipe_fts(rowid, name, text) '
+        f"VALUES (new.id, {sqlite_values('new')}); END"
+    ),
+}
+
+
+def restore_sqlite_index(using='default'):
+    """Вернуть потерянные триггеры FTS и переиндексировать рецепты.
+
+    Вызывается после migrate; если все триггеры на месте, ничего
+    не делает.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master "
+            "WHERE name = 'food_recipe_fts' OR type = 'trigger'")
+        existing = {name for _, name in cursor.fetchall()}
+        missing = set(SQLITE_TRIGGERS) - existing
+        if 'food_recipe_fts' not in existing or not missing:
+            return
+        for name in missing:
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {name} '
+                f'{SQLITE_TRIGGERS[name]}')
+        # пока триггеров не было, индекс мог разойтись с таблицей
+        cursor.execute(
+            "INSERT INTO food_recipe_fts(food_recipe_fts) "
+            "VALUES ('delete-all')")
+        cursor.execute(
+            'INSERT INTO food_recipe_fts(rowid, name, text) '
+            f"SELECT id, {sqlite_values('food_recipe')} FROM food_recipe")
+
+
+def search_recipes(recipes, query):
+    """Отфильтровать recipes по запросу и упорядочить по релевантности."""
+    query = query.strip()
+    if not query:
+        return recipes
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(recipes, query)
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(recipes, query)
+    return recipes.filter(
+        Q(name__icontains=query) | Q(text__icontains=query))
+
+
+def _search_postgresql(recipes, query):
+    # импорт здесь: модулю нужен psycopg, которого может не быть в dev
+    from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                SearchVector,
+                                                TrigramSimilarity)
+
+    # выражение совпадает с индексом food_recipe_search_gin
+    vector = SearchVector('name', 'text', config=SEARCH_CONFIG)
+    search_query = SearchQuery(
+        query, config=SEARCH_CONFIG, search_type='websearch')
+    return recipes.annotate(
+        search=vector,
+        search_rank=(
+            SearchRank(vector, search_query)
+            + TrigramSimilarity('name', query)
+        ),
+    ).filter(
+        # name__icontains идёт по индексу food_recipe_name_trgm
+        Q(search=search_query) | Q(name__icontains=query)
+    ).order_by(F('search_rank').desc(), '-id')
+
+
+def _search_sqlite(recipes, query):
+    # в таблице FTS ё заменена на е (см. sqlite_values)
+    words = WORD_RE.findall(query.replace('ё', 'е').replace('Ё', 'Е'))
+    if not words:
+        return recipes.none()
+    # каждое слово — префикс, кавычки защищают от синтаксиса FTS5
+    match = ' '.join(f'"{word}"*' for word in words)
+    # rank в FTS5 — bm25(), чем меньше, тем релевантнее
+    return recipes.filter(
+        search_entry__document__match=match
+    ).annotate(
+        search_rank=-F('search_entry__rank')
+    ).order_by(F('search_rank').desc(), '-id')
@@ -0,0 +1,115 @@
+# backend/food/shopping_cart.py
+# Инкрементальное обновление ShoppingCartTotal: изменения корзины и состава
+# рецептов превращаются в приращения {ingredient_id: amount}, которые
+# прибавляются к итогам всех затронутых пользователей.
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from food.models import RecipeIngredient, ShoppingCartItem, ShoppingCartTotal
+
+BATCH_SIZE = 1000
+
+
+def recipe_amounts(recipe_id, sign=1):
+    return {
+        ingredient_id: sign * amount
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', 'amount')
+    }
+
+
+def apply_deltas(user_ids, deltas):
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+    with transaction.atomic():
+        ShoppingCartTotal.objects.bulk_create(
+            (
+                ShoppingCartTotal(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=0)
+                for user_id in user_ids
+                for ingredient_id in deltas
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        totals = ShoppingCartTotal.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas)
+        totals.update(amount=F('amount') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(delta))
+                for ingredient_id, delta in deltas.items()
+            ),
+            output_field=IntegerField(),
+        ))
+        totals.filter(amount__lte=0).delete()
+
+
+def add_recipe_to_cart(user_id, recipe_id):
+    apply_deltas([user_id], recipe_amounts(recipe_id))
+
+
+def remove_recipe_from_cart(user_id, recipe_id):
+    apply_deltas([user_id], recipe_amounts(recipe_id, sign=-1))
+
+
+def change_recipe_ingredients(recipe_id, deltas):
+    """Учесть изменение состава рецепта в корзинах, где он лежит."""
+    apply_deltas(
+        list(ShoppingCartItem.objects.filter(
+            recipe_id=recipe_id).values_list('user_id', flat=True)),
+        deltas,
+    )
+
+
+def live_totals():
+    """Итоги корзин, посчитанные заново по ShoppingCartItem."""
+    return RecipeIngredient.objects.filter(
+        recipe__shoppingcartitems__isnull=False
+    ).values(
+        'ingredient_id', user_id=F('recipe__shoppingcartitems__user_id')
+    ).annotate(
+        total=Sum('amount')
+    ).order_by()
+
+
+def rebuild():
+    with transaction.atomic():
+        ShoppingCartTotal.objects.all().delete()
+        ShoppingCartTotal.objects.bulk_create(
+            (
+                ShoppingCartTotal(
+                    user_id=row['user_id'],
+                    ingredient_id=row['ingredient_id'],
+                    amount=row['total'],
+                )
+                for row in live_totals().iterator(chunk_size=BATCH_SIZE)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def find_mismatches():
+    """Пары (user_id, ingredient_id), где таблица расходится с подсчётом.
+
+    Возвращает словарь {(user_id, ingredient_id): (в таблице, подсчёт)}.
+    """
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in
+        ShoppingCartTotal.objects.values_list(
+            'user_id', 'ingredient_id', 'amount').iterator()
+    }
+    mismatches = {}
+    for row in live_totals().iterator(chunk_size=BATCH_SIZE):
+        key = (row['user_id'], row['ingredient_id'])
+        amount = stored.pop(key, None)
+        if amount != row['total']:
+            mismatches[key] = (amount, row['total'])
+    for key, amount in stored.items():
+        mismatches[key] = (amount, None)
+    return mismatches
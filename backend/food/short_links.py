@@ -0,0 +1,46 @@
+# backend/food/short_links.py
+# Кеш существования рецептов для коротких ссылок /s/<pk>/ в памяти
+# процесса: LRU ограниченного размера, отсутствующие id тоже кешируются
+# (на меньший срок — рецепт с таким id ещё может появиться). Удаление
+# и создание рецепта сбрасывают запись сигналом (food.signals),
+# остальные процессы узнают об изменении по истечении срока записи.
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from food.models import Recipe
+
+
+class RecipeExistenceCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # pk -> (существует, истекает)
+
+    def exists(self, pk):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(pk)
+                return entry[0]
+        exists = Recipe.objects.filter(pk=pk).exists()
+        ttl = (
+            settings.SHORT_LINK_CACHE_TTL if exists
+            else settings.SHORT_LINK_MISSING_CACHE_TTL
+        )
+        with self._lock:
+            self._entries[pk] = (exists, now + ttl)
+            self._entries.move_to_end(pk)
+            while len(self._entries) > settings.SHORT_LINK_CACHE_SIZE:
+                self._entries.popitem(last=False)
+        return exists
+
+    def forget(self, pk):
+        with self._lock:
+            self._entries.pop(pk, None)
+
+
+recipe_exists = RecipeExistenceCache()
@@ -0,0 +1,154 @@
+# backend/food/signals.py
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from food import feed, matching, search, shopping_cart, short_links, thumbnails
+from food.cache import bump_version
+from food.models import (Favorite, Follow, Ingredient, Recipe,
+                         RecipeIngredient, ShoppingCartItem, Tag, User)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, app_config, using, **kwargs):
+    if app_config.label == 'food':
+        search.restore_sqlite_index(using)
+
+
+@receiver(post_save, sender=ShoppingCartItem)
+def add_to_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        shopping_cart.add_recipe_to_cart(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCartItem)
+def remove_from_cart_totals(sender, instance, **kwargs):
+    shopping_cart.remove_recipe_from_cart(
+        instance.user_id, instance.recipe_id)
+
+
+# bulk_create/bulk_update сигналов не посылают, такие места в коде
+# вызывают shopping_cart.change_recipe_ingredients и
+# matching.recipe_changed сами
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(sender, instance, **kwargs):
+    instance._saved = (
+        RecipeIngredient.objects.filter(pk=instance.pk).values_list(
+            'ingredient_id', 'amount').first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_cart_totals(sender, instance, **kwargs):
+    deltas = {instance.ingredient_id: instance.amount}
+    if instance._saved:
+        ingredient_id, amount = instance._saved
+        deltas[ingredient_id] = deltas.get(ingredient_id, 0) - amount
+    shopping_cart.change_recipe_ingredients(instance.recipe_id, deltas)
+    matching.recipe_changed(instance.recipe_id)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def subtract_from_cart_totals(sender, instance, **kwargs):
+    shopping_cart.change_recipe_ingredients(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount})
+    matching.recipe_changed(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_feeds_on_publish(sender, instance, created, **kwargs):
+    if created:
+        invalidate_feeds_on_commit(instance.author_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_feeds_on_delete(sender, instance, **kwargs):
+    invalidate_feeds_on_commit(instance.author_id)
+
+
+def invalidate_feeds_on_commit(author_id):
+    # до фиксации транзакции параллельный запрос пересобрал бы ленту
+    # без нового рецепта и закешировал бы её
+    transaction.on_commit(lambda: feed.invalidate_followers(author_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follower_feed(sender, instance, **kwargs):
+    follower_id = instance.follower_id
+    transaction.on_commit(lambda: feed.invalidate(follower_id))
+
+
+# новые файлы ещё не записаны в хранилище на pre_save (_committed = False),
+# миниатюры для них собираются после сохранения
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=User)
+def detect_new_image(sender, instance, **kwargs):
+    _, field, hash_field = thumbnails.SOURCES[thumbnails.KINDS[sender]]
+    image = getattr(instance, field)
+    instance._new_image = bool(image) and not image._committed
+    if instance._new_image or not image:
+        setattr(instance, hash_field, '')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def schedule_thumbnails(sender, instance, **kwargs):
+    if getattr(instance, '_new_image', False):
+        instance._new_image = False
+        kind = thumbnails.KINDS[sender]
+        thumbnails.schedule(
+            kind, instance.pk,
+            getattr(instance, thumbnails.SOURCES[kind][1]).name)
+
+
+# версии для ETag списка рецептов (api.conditional), меняются после
+# фиксации транзакции, чтобы новый ETag не достался старым данным
+def bump_version_on_commit(model, scope=None):
+    transaction.on_commit(lambda: bump_version(model, scope))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_lists(sender, **kwargs):
+    bump_version_on_commit(Recipe)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_in_lists(sender, update_fields=None, **kwargs):
+    if update_fields != frozenset({'last_login'}):
+        bump_version_on_commit(User)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCartItem)
+@receiver(post_delete, sender=ShoppingCartItem)
+def invalidate_user_recipe_flags(sender, instance, **kwargs):
+    bump_version_on_commit(User, instance.user_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_user_follow_flags(sender, instance, **kwargs):
+    bump_version_on_commit(User, instance.follower_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def forget_short_link(sender, instance, created=True, **kwargs):
+    # новый рецепт сбрасывает запись «нет такого id», удалённый — «есть»;
+    # post_delete не передаёт created
+    if created:
+        pk = instance.pk
+        transaction.on_commit(lambda: short_links.recipe_exists.forget(pk))
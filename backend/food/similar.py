@@ -0,0 +1,144 @@
+# backend/food/similar.py
+# Похожие рецепты (GET /api/recipes/{id}/similar/).
+# Соседей считает заранее команда build_similar_recipes: мера Жаккара
+# по объединению множеств продуктов и тегов рецепта. Результат — один
+# файл .npy со структурированным массивом, отсортированным по id рецепта;
+# веб-процессы открывают его через mmap и к RecipeIngredient не обращаются.
+
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from food.models import Recipe, RecipeIngredient
+
+FILE_NAME = 'similar_recipes.npy'
+
+
+def index_path():
+    return os.path.join(settings.SIMILAR_RECIPES_DIR, FILE_NAME)
+
+
+def index_dtype(top):
+    return np.dtype([
+        ('id', np.int64),
+        ('neighbors', np.int64, (top,)),  # -1 — пустое место
+        ('scores', np.float32, (top,)),
+    ])
+
+
+def _group(pairs):
+    groups = {}
+    for recipe_id, item_id in pairs.iterator(chunk_size=10000):
+        groups.setdefault(recipe_id, []).append(item_id)
+    return groups
+
+
+def build_index(top):
+    """Посчитать top ближайших соседей для каждого рецепта.
+
+    Кандидаты — рецепты хотя бы с одним общим продуктом: общих тегов
+    мало, и через них пришлось бы сравнивать каждый рецепт со всеми.
+    """
+    recipe_ids = np.array(
+        sorted(Recipe.objects.values_list('id', flat=True)), dtype=np.int64)
+    rows = {int(recipe_id): row for row, recipe_id in enumerate(recipe_ids)}
+    ingredients = _group(RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id'))
+    tags = _group(Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag_id'))
+
+    # теги — плотная матрица рецепт x тег, их единицы или десятки
+    tag_columns = {
+        tag_id: column for column, tag_id in enumerate(
+            sorted({tag_id for ids in tags.values() for tag_id in ids}))
+    }
+    tag_matrix = np.zeros((len(recipe_ids), len(tag_columns)), np.int32)
+    for recipe_id, tag_ids in tags.items():
+        tag_matrix[rows[recipe_id], [tag_columns[t] for t in tag_ids]] = 1
+
+    postings = {}
+    for recipe_id, ingredient_ids in ingredients.items():
+        for ingredient_id in ingredient_ids:
+            postings.setdefault(ingredient_id, []).append(rows[recipe_id])
+    postings = {
+        ingredient_id: np.array(posting, dtype=np.int64)
+        for ingredient_id, posting in postings.items()
+    }
+    sizes = tag_matrix.sum(axis=1)
+    for recipe_id, ingredient_ids in ingredients.items():
+        sizes[rows[recipe_id]] += len(ingredient_ids)
+
+    index = np.zeros(len(recipe_ids), dtype=index_dtype(top))
+    index['id'] = recipe_ids
+    index['neighbors'] = -1
+    for recipe_id, ingredient_ids in ingredients.items():
+        row = rows[recipe_id]
+        candidates, common = np.unique(
+            np.concatenate([postings[i] for i in ingredient_ids]),
+            return_counts=True)
+        keep = candidates != row
+        candidates, common = candidates[keep], common[keep]
+        if not len(candidates):
+            continue
+        common = common + tag_matrix[candidates] @ tag_matrix[row]
+        scores = common / (sizes[row] + sizes[candidates] - common)
+        order = np.lexsort((-recipe_ids[candidates], -scores))[:top]
+        index['neighbors'][row, :len(order)] = recipe_ids[candidates[order]]
+        index['scores'][row, :len(order)] = scores[order]
+    return index
+
+
+def save_index(index):
+    path = index_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # np.save дописывает .npy к имени без этого расширения
+    tmp_path = f'{path}.tmp.npy'
+    np.save(tmp_path, index)
+    # открытые mmap старого файла продолжают работать
+    os.replace(tmp_path, path)
+
+
+class SimilarRecipes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._index = None
+
+    def _load(self):
+        path = index_path()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self._mtime, self._index = None, None
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._index = np.load(path, mmap_mode='r')
+                    self._mtime = mtime
+        return self._index
+
+    def get(self, recipe_id, limit):
+        """Список (recipe_id, сходство) по убыванию сходства.
+
+        Пустой, если индекс не построен или рецепт добавлен после
+        последней сборки.
+        """
+        index = self._load()
+        if index is None or not len(index):
+            return []
+        row = np.searchsorted(index['id'], recipe_id)
+        if row == len(index) or index['id'][row] != recipe_id:
+            return []
+        entry = index[row]
+        return [
+            (int(neighbor), float(score))
+            for neighbor, score in zip(
+                entry['neighbors'][:limit], entry['scores'][:limit])
+            if neighbor >= 0
+        ]
+
+
+similar_recipes = SimilarRecipes()
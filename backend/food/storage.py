@@ -0,0 +1,120 @@
+# backend/food/storage.py
+# Хранилище изображений рецептов и аватаров с адресацией по содержимому:
+# файл называется sha256 своих байтов, одинаковые картинки хранятся один
+# раз. Удаляется файл, только когда на него не ссылается ни одна запись
+# (старые файлы при замене и удалении убирает django-cleanup).
+# Ссылки проверяются после фиксации транзакции, удалившей запись,
+# под той же блокировкой, что и _save; _save, не найдя файла,
+# записывает его заново.
+
+import hashlib
+import os
+import uuid
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+HASH_CHUNK_SIZE = 64 * 1024
+LOCK_NAME = '.content-storage.lock'
+
+
+def content_name(name, digest):
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    return os.path.join(directory, digest[:2], f'{digest}{extension}')
+
+
+def is_content_name(name, digest):
+    return os.path.splitext(os.path.basename(name))[0] == digest
+
+
+def file_digest(content):
+    sha256 = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        sha256.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return sha256.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # имя определяется содержимым, совпадение имён — это тот же файл
+        return name
+
+    @contextmanager
+    def lock(self):
+        """Блокировка хранилища, общая для всех процессов."""
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, LOCK_NAME), 'ab') as file:
+            locks.lock(file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(file)
+
+    def _save(self, name, content):
+        name = content_name(name, file_digest(content))
+        # пишем во временный файл и переименовываем: читатели не увидят
+        # недописанный файл; долгая запись идёт вне блокировки
+        temporary = None
+        if not self.exists(name):
+            temporary = self.save_temporary(name, content)
+        with self.lock():
+            if self.exists(name):
+                if temporary is not None:
+                    os.remove(self.path(temporary))
+            else:
+                if temporary is None:
+                    # файл удалили после проверки выше
+                    temporary = self.save_temporary(name, content)
+                os.replace(self.path(temporary), self.path(name))
+        return name
+
+    def save_temporary(self, name, content):
+        return super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+
+    def fields(self):
+        return [
+            (model, field)
+            for model in apps.get_models()
+            for field in model._meta.concrete_fields
+            if getattr(field, 'storage', None) is self
+        ]
+
+    def is_referenced(self, name):
+        """Ссылается ли на файл хоть одна запись (счётчик ссылок
+        — сами поля моделей с этим хранилищем)."""
+        return any(
+            model._default_manager.filter(**{field.name: name}).exists()
+            for model, field in self.fields()
+        )
+
+    def delete(self, name):
+        if not name:
+            return
+        # до фиксации транзакции удалённая или заменённая запись ещё
+        # видна другим как ссылка, а новая чужая — не видна
+        transaction.on_commit(lambda: self.delete_unreferenced(name))
+
+    def delete_unreferenced(self, name):
+        if not self.exists(name):
+            return
+        # ссылки проверяются под блокировкой прямо перед удалением:
+        # параллельный _save того же файла дождётся её или увидит,
+        # что файла нет, и запишет его заново
+        with self.lock():
+            if not self.is_referenced(name):
+                super().delete(name)
+
+
+content_storage = ContentAddressedStorage()
+
+
+def get_content_storage():
+    return content_storage
@@ -0,0 +1,155 @@
+# backend/food/thumbnails.py
+# Миниатюры изображений рецептов и аватаров. Собираются после загрузки
+# в фоновом потоке, имена файлов строятся из sha256 оригинала, поэтому
+# одинаковые картинки дают одни и те же файлы, а nginx может отдавать
+# их из /media/thumbnails/ с вечным кешем.
+
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from food.cache import bump_version
+from food.models import Recipe, User
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY = 'thumbnails'
+# формат: (расширение, формат Pillow); webp и jpeg для старых браузеров
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+QUALITY = 82
+# вариант: (ширина, высота, обрезать до этих пропорций)
+VARIANTS = {
+    'recipe': {
+        'list': (480, 360, True),
+        'card': (960, 720, False),
+    },
+    'avatar': {
+        'avatar': (96, 96, True),
+        'avatar_2x': (192, 192, True),
+    },
+}
+# вид изображения: (модель, поле изображения, поле хеша)
+SOURCES = {
+    'recipe': (Recipe, 'image', 'image_hash'),
+    'avatar': (User, 'avatar', 'avatar_hash'),
+}
+KINDS = {model: kind for kind, (model, _, _) in SOURCES.items()}
+
+executor = ThreadPoolExecutor(
+    max_workers=max(settings.THUMBNAIL_WORKERS, 1),
+    thread_name_prefix='thumbnails',
+)
+
+
+def thumbnail_name(digest, variant, extension):
+    return f'{DIRECTORY}/{digest[:2]}/{digest}_{variant}.{extension}'
+
+
+def variant_names(digest, kind):
+    return [
+        thumbnail_name(digest, variant, extension)
+        for variant in VARIANTS[kind]
+        for extension, _ in FORMATS
+    ]
+
+
+def thumbnail_url(digest, variant, extension='webp'):
+    return default_storage.url(thumbnail_name(digest, variant, extension))
+
+
+def variant_urls(digest, kind):
+    """Адреса миниатюр: {вариант: {расширение: url}}, без обращения к диску."""
+    return {
+        variant: {
+            extension: thumbnail_url(digest, variant, extension)
+            for extension, _ in FORMATS
+        }
+        for variant in VARIANTS[kind]
+    }
+
+
+def resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    return image
+
+
+def encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        # прозрачные области jpeg заливаем белым
+        background = Image.new('RGB', image.size, 'white')
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.getchannel('A'))
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def make_thumbnails(data, kind):
+    """Сохранить недостающие миниатюры изображения, вернуть его sha256."""
+    digest = hashlib.sha256(data).hexdigest()
+    missing = [
+        (variant, size, extension, image_format)
+        for variant, size in VARIANTS[kind].items()
+        for extension, image_format in FORMATS
+        if not default_storage.exists(
+            thumbnail_name(digest, variant, extension))
+    ]
+    if not missing:
+        return digest
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        resized = {}
+        for variant, (width, height, crop), extension, image_format in (
+                missing):
+            if variant not in resized:
+                resized[variant] = resize(source, width, height, crop)
+            default_storage.save(
+                thumbnail_name(digest, variant, extension),
+                ContentFile(encode(resized[variant], image_format)))
+    return digest
+
+
+def process(kind, pk, name):
+    model, field, hash_field = SOURCES[kind]
+    storage = model._meta.get_field(field).storage
+    with storage.open(name, 'rb') as image_file:
+        digest = make_thumbnails(image_file.read(), kind)
+    # изображение могли заменить, пока собирались миниатюры
+    if model.objects.filter(pk=pk, **{field: name}).update(
+            **{hash_field: digest}):
+        # в списках рецептов появились адреса миниатюр
+        bump_version(model)
+
+
+def _run(kind, pk, name):
+    try:
+        process(kind, pk, name)
+    except Exception:
+        logger.exception('Не удалось собрать миниатюры %s', name)
+    finally:
+        connection.close()
+
+
+def schedule(kind, pk, name):
+    """Собрать миниатюры после фиксации транзакции.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры собираются в текущем потоке.
+    """
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: executor.submit(_run, kind, pk, name))
+    else:
+        transaction.on_commit(lambda: process(kind, pk, name))
@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.http import Http404
 from django.shortcuts import redirect
+from django.utils.cache import patch_cache_control
 
-from food.models import Recipe
+from food.short_links import recipe_exists
 
 
 def short_link_redirect_view(request, pk):
-    if not Recipe.objects.filter(pk=pk).exists():
+    # без запросов к БД, пока id есть в кеше; ответ может
+    # закешировать и nginx (см. location /s/)
+    if not recipe_exists.exists(pk):
         raise Http404(f'Рецепт с id={pk} не найден.')
-    return redirect(f'/recipes/{pk}/')
+    response = redirect(f'/recipes/{pk}/')
+    patch_cache_control(
+        response, public=True, max_age=settings.SHORT_LINK_REDIRECT_MAX_AGE)
+    return response
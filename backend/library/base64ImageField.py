@@ -1,18 +1,119 @@
 # backend/library/base64ImageField.py
 
 import base64
+import binascii
+import tempfile
 import uuid
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 from rest_framework import serializers
 
+DATA_URI_PREFIX = 'data:image'
+BASE64_MARKER = ';base64,'
+# декодируем кусками, кратными 4 символам base64
+CHUNK_SIZE = 64 * 1024
+# сигнатура в начале файла: (смещение, байты, расширение, формат Pillow)
+SIGNATURES = (
+    (0, b'\x89PNG\r\n\x1a\n', 'png', 'PNG'),
+    (0, b'\xff\xd8\xff', 'jpg', 'JPEG'),
+    (0, b'GIF87a', 'gif', 'GIF'),
+    (0, b'GIF89a', 'gif', 'GIF'),
+    (8, b'WEBP', 'webp', 'WEBP'),
+)
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+
+def sniff_format(head):
+    for offset, signature, extension, image_format in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if extension == 'webp' and head[:4] != b'RIFF':
+                continue
+            return extension, image_format
+    return None, None
+
 
 class Base64ImageField(serializers.ImageField):
-    def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
+    """Изображение в виде data URI (data:image/...;base64,...).
+
+    base64 декодируется кусками во временный файл (в памяти до
+    FILE_UPLOAD_MAX_MEMORY_SIZE, дальше на диске). Размер проверяется
+    по длине строки ещё до декодирования, формат — по сигнатуре файла,
+    а не по типу из data URI, число пикселей — по заголовку, без
+    распаковки изображения.
+    """
 
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            filename = f'{uuid.uuid4()}.{ext}'
-            data = ContentFile(base64.b64decode(imgstr), name=filename)
+    default_error_messages = {
+        'invalid_base64': 'Некорректные данные base64.',
+        'too_large': 'Размер изображения больше {max_size} байт.',
+        'too_many_pixels': 'Изображение больше {max_pixels} пикселей.',
+        'unsupported_format': (
+            'Поддерживаются только изображения PNG, JPEG, GIF и WebP.'),
+        'invalid_image': 'Файл повреждён или не является изображением.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith(DATA_URI_PREFIX):
+            return self.decode_data_uri(data)
         return super().to_internal_value(data)
+
+    def decode_data_uri(self, data):
+        start = data.find(BASE64_MARKER)
+        if start == -1:
+            self.fail('invalid_base64')
+        start += len(BASE64_MARKER)
+        max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+        padding = data[-2:].count('=')
+        if (len(data) - start) // 4 * 3 - padding > max_size:
+            self.fail('too_large', max_size=max_size)
+
+        file = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        try:
+            size = 0
+            for position in range(start, len(data), CHUNK_SIZE):
+                try:
+                    chunk = base64.b64decode(
+                        data[position:position + CHUNK_SIZE], validate=True)
+                except binascii.Error:
+                    self.fail('invalid_base64')
+                size += len(chunk)
+                file.write(chunk)
+            file.seek(0)
+            extension, image_format = sniff_format(file.read(16))
+            if extension is None:
+                self.fail('unsupported_format')
+            file.seek(0)
+            self.check_image(file, image_format)
+            file.seek(0)
+        except BaseException:
+            file.close()
+            raise
+        return UploadedFile(
+            file=file,
+            name=f'{uuid.uuid4()}.{extension}',
+            content_type=CONTENT_TYPES[extension],
+            size=size,
+        )
+
+    def check_image(self, file, image_format):
+        max_pixels = settings.IMAGE_UPLOAD_MAX_PIXELS
+        try:
+            # Image.open читает только заголовок
+            with Image.open(file, formats=[image_format]) as image:
+                width, height = image.size
+                if width * height > max_pixels:
+                    self.fail('too_many_pixels', max_pixels=max_pixels)
+                image.verify()
+        except Image.DecompressionBombError:
+            # Pillow отклоняет изображение больше своего лимита ещё
+            # при открытии, до проверки выше
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+        except (OSError, SyntaxError, ValueError):
+            self.fail('invalid_image')